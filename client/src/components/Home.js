@@ -31,8 +31,7 @@ function Home({ isAuthenticated, user_id }) {
 
     useEffect(() => {
       if (isAuthenticated) {
-        fetch("/recipes")
-          .then((res) => res.json())
+        fetchAllRecipes()
           .then((data) => {
             setRecipes(data);
             setFilteredRecipes(data); // Initialize filtered recipes with all recipes
@@ -168,6 +167,25 @@ function Home({ isAuthenticated, user_id }) {
       });
   };
 
+  // /recipes answers a page at a time; follow X-Next-Cursor to the end
+  // so the search below filters the whole catalog
+  const fetchAllRecipes = async () => {
+    const allRecipes = [];
+    let url = "/recipes?limit=200";
+    while (url) {
+      const response = await fetch(url);
+      if (!response.ok) {
+        throw new Error("Failed to fetch recipes");
+      }
+      allRecipes.push(...(await response.json()));
+      const cursor = response.headers.get("X-Next-Cursor");
+      url = cursor
+        ? `/recipes?limit=200&after=${encodeURIComponent(cursor)}`
+        : null;
+    }
+    return allRecipes;
+  };
+
   const fetchFavoriteRecipes = async (userId) => {
     try {
       const response = await fetch(`/favorite_recipes/${userId}`);
@@ -1,9 +1,9 @@
 #!/usr/bin/env python3
 
 # Standard library imports
-from datetime import datetime, timedelta
-from werkzeug.utils import secure_filename
-import os
+import functools
+import hmac
+from datetime import datetime, timedelta, timezone
 
 # Remote library imports
 from flask import (
@@ -13,12 +13,31 @@ from flask import (
     make_response,
     jsonify,
     render_template,
-    send_from_directory,
 )
 from flask_restful import Resource
+from sqlalchemy.exc import IntegrityError
 
 # Local imports
-from config import app, db, api, bcrypt
+from config import (
+    app,
+    db,
+    api,
+    image_store,
+    metrics,
+    password_hasher,
+    response_cache,
+    session_users,
+    statement_stats,
+)
+from pagination import keyset_page, page_limit, page_response
+from search import search_recipes
+from pantry import ingredient_index
+from query_stats import SORT_KEYS
+from recommendations import recommender
+from similar import similar_recipes
+from sync import SYNC_PAGE_SIZE, changes_since, current_token, sync_supported
+import load_plans
+import serializers
 
 # Add your model imports
 from models import (
@@ -26,14 +45,60 @@ from models import (
     Profile,
     Recipe,
     Ingredient,
+    RecipeAssociation,
     FavoriteRecipe,
     RecipeRating,
     Comment,
     JournalEntry,
+    JournalImage,
 )
 
 # Views go here!
 
+# What recommendation lists show of each recipe
+RECIPE_SUMMARY_FIELDS = frozenset(
+    ("id", "title", "description", "meal_type", "image_url")
+)
+
+
+def session_user_id():
+    return session.get("user_id")
+
+
+def ops_only(method):
+    """For the stats and metrics endpoints: only requests bearing the
+    OPS_TOKEN get through, and without one configured they don't exist."""
+
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        token = app.config["OPS_TOKEN"]
+        if not token:
+            return {"error": "Not found"}, 404
+        supplied = request.headers.get("Authorization", "")
+        if not hmac.compare_digest(supplied.encode(), f"Bearer {token}".encode()):
+            return {"error": "Not authorized"}, 401
+        return method(*args, **kwargs)
+
+    return wrapper
+
+
+def mark_favorites(items, fields=None, favorite_ids=None):
+    """Add is_favorited to serialized recipes for the session user.
+
+    Looks the whole page up in one query unless the caller already knows
+    the user's favorite ids. No-op for anonymous requests.
+    """
+    user_id = session_user_id()
+    if not user_id or (fields is not None and "is_favorited" not in fields):
+        return items
+    if favorite_ids is None:
+        favorite_ids = FavoriteRecipe.favorited_ids(
+            user_id, [item["id"] for item in items]
+        )
+    for item in items:
+        item["is_favorited"] = item["id"] in favorite_ids
+    return items
+
 
 @app.route("/")
 def index():
@@ -50,7 +115,7 @@ class Login(Resource):
         if not username or not password:
             return {"error": "Username and password are required"}, 400
 
-        user = User.query.filter_by(username=username).first()
+        user = User.query.options(*load_plans.USER).filter_by(username=username).first()
 
         if user and user.authenticate(password):
             session["user_id"] = user.id
@@ -61,6 +126,7 @@ class Login(Resource):
 
 class Logout(Resource):
     def delete(self):
+        session_users.delete(session.get("user_id"))
         session["user_id"] = None
         return {"message": "Logged Out"}, 204
 
@@ -68,17 +134,26 @@ class Logout(Resource):
 class CheckSession(Resource):
 
     def get(self):
-        user_id = session["user_id"]
-        if user_id:
-            user = User.query.filter(User.id == user_id).first()
-            return user.to_dict(), 200
+        user_id = session.get("user_id")
+        if not user_id:
+            return {}, 401
 
-        return {}, 401
+        data = session_users.get(user_id)
+        if data is None:
+            user = (
+                User.query.options(*load_plans.USER).filter(User.id == user_id).first()
+            )
+            if not user:
+                return {}, 401
+            data = serializers.USER(user)
+            session_users.set(user_id, data)
+        return serializers.json_response(data)
 
 
 class ClearSession(Resource):
 
     def delete(self):
+        session_users.delete(session.get("user_id"))
         session["user_id"] = None
 
         return {}, 204
@@ -103,16 +178,12 @@ class SignUp(Resource):
         ):
             return {"error": "Username or Email is already taken"}, 400
 
-        hashed_password = bcrypt.generate_password_hash(
-            password.encode("utf-8")
-        ).decode("utf-8")
-
         new_user = User(
             username=username,
             email=email,
-            _password_hash=hashed_password,
             avatar=avatar,
         )
+        new_user.password_hash = password
 
         db.session.add(new_user)
         db.session.commit()
@@ -124,12 +195,13 @@ class SignUp(Resource):
 
 class Users(Resource):
     def get(self):
-        return make_response([user.to_dict() for user in User.query.all()], 200)
+        users = User.query.options(*load_plans.USER).all()
+        return make_response([user.to_dict() for user in users], 200)
 
 
 class UsersById(Resource):
     def get(self, id):
-        user = User.query.get(id)
+        user = User.query.options(*load_plans.USER).get(id)
         if user:
             return user.to_dict(), 200
         return {"error": "User not found"}, 404
@@ -149,7 +221,11 @@ class UsersById(Resource):
                     setattr(user, attr, data[attr])
 
             db.session.commit()
-            return make_response(user.to_dict(), 200)
+            # Users are embedded in cached rating and favorite payloads
+            response_cache.clear()
+            session_users.delete(id)
+            user = User.query.options(*load_plans.USER).populate_existing().get(id)
+            return serializers.json_response(serializers.USER(user))
 
         except ValueError:
             return make_response({"errors": ["validation errors"]}, 400)
@@ -183,6 +259,8 @@ class UsersById(Resource):
 
         db.session.delete(user)
         db.session.commit()
+        response_cache.clear()
+        session_users.delete(id)
 
         session["user_id"] = None
 
@@ -190,8 +268,47 @@ class UsersById(Resource):
 
 
 class Recipes(Resource):
+    @response_cache.cached(lambda: ("recipes",), vary=session_user_id)
     def get(self):
-        return make_response([recipe.to_dict() for recipe in Recipe.query.all()], 200)
+        fields = serializers.requested_fields()
+        query = Recipe.query
+        if serializers.RECIPE.needs_relationships(fields):
+            query = query.options(*load_plans.RECIPE)
+
+        meal_type = request.args.get("meal_type")
+        if meal_type:
+            query = query.filter(Recipe.meal_type == meal_type)
+
+        user_id = request.args.get("user_id", type=int)
+        if user_id:
+            query = query.filter(Recipe.user_id == user_id)
+
+        # A range instead of LIKE 'prefix%' so SQLite can use ix_recipes_title
+        title = request.args.get("title")
+        if title:
+            query = query.filter(Recipe.title >= title, Recipe.title < title + "\uffff")
+
+        ingredient = request.args.get("ingredient")
+        if ingredient:
+            query = (
+                query.join(Recipe.ingredients_associations)
+                .join(RecipeAssociation.ingredient)
+                .filter(Ingredient.normalized_name == Ingredient.normalize(ingredient))
+            )
+
+        try:
+            recipes, next_cursor = keyset_page(
+                query, [Recipe.id], request.args.get("after")
+            )
+        except ValueError as e:
+            return {"error": str(e)}, 400
+
+        return page_response(
+            serializers.json_response(
+                mark_favorites(serializers.RECIPE.many(recipes, fields), fields)
+            ),
+            next_cursor,
+        )
 
     def post(self):
         data = request.get_json()
@@ -211,16 +328,10 @@ class Recipes(Resource):
         if not user:
             return make_response(jsonify({"errors": ["User not found"]}), 404)
 
-        ingredients = []
-
-        for name in ingredient_names:
-            existing_ingredient = Ingredient.query.filter_by(name=name).first()
-            if existing_ingredient:
-                ingredients.append(existing_ingredient)
-            else:
-                new_ingredient = Ingredient(name=name)
-                db.session.add(new_ingredient)
-                ingredients.append(new_ingredient)
+        try:
+            ingredients = Ingredient.resolve(ingredient_names)
+        except ValueError as e:
+            return make_response(jsonify({"errors": [str(e)]}), 400)
 
         new_recipe = Recipe(
             title=title,
@@ -234,13 +345,158 @@ class Recipes(Resource):
 
         db.session.add(new_recipe)
         db.session.commit()
+        response_cache.invalidate("recipes", "ingredients")
+
+        recipe = (
+            Recipe.query.options(*load_plans.RECIPE)
+            .populate_existing()
+            .get(new_recipe.id)
+        )
+        return serializers.json_response(serializers.RECIPE(recipe), 201)
+
+
+class RecipeSearch(Resource):
+    def get(self):
+        q = request.args.get("q", "").strip()
+        if not q:
+            return {"error": "Search query is required"}, 400
+
+        return make_response(search_recipes(q, page_limit()), 200)
+
+
+class TopRatedRecipes(Resource):
+    @response_cache.cached(lambda: ("recipes",), vary=session_user_id)
+    def get(self):
+        fields = serializers.requested_fields()
+        # Unrated recipes have no average to rank (or page) by
+        min_count = max(1, request.args.get("min_count", 1, type=int))
+        query = Recipe.query.filter(Recipe.rating_count >= min_count)
+        if serializers.RECIPE.needs_relationships(fields):
+            query = query.options(*load_plans.RECIPE)
+
+        meal_type = request.args.get("meal_type")
+        if meal_type:
+            query = query.filter(Recipe.meal_type == meal_type)
+
+        try:
+            recipes, next_cursor = keyset_page(
+                query,
+                [Recipe.rating_average, Recipe.rating_count, Recipe.id],
+                request.args.get("after"),
+                descending=True,
+            )
+        except ValueError as e:
+            return {"error": str(e)}, 400
+
+        return page_response(
+            serializers.json_response(
+                mark_favorites(serializers.RECIPE.many(recipes, fields), fields)
+            ),
+            next_cursor,
+        )
+
+
+class CookableRecipes(Resource):
+    def get(self):
+        names = [
+            name.strip()
+            for name in request.args.get("ingredients", "").split(",")
+            if name.strip()
+        ]
+        ingredient_ids = set(request.args.getlist("ingredient_id", type=int))
+        if names:
+            ingredient_ids.update(
+                id
+                for (id,) in db.session.query(Ingredient.id).filter(
+                    Ingredient.normalized_name.in_(
+                        [Ingredient.normalize(name) for name in names]
+                    )
+                )
+            )
+        if not names and not ingredient_ids:
+            return {"error": "At least one ingredient is required"}, 400
+
+        matches = ingredient_index.match(
+            ingredient_ids,
+            page_limit(),
+            max_missing=request.args.get("max_missing", type=int),
+        )
+
+        recipes = {
+            recipe.id: recipe
+            for recipe in Recipe.query.filter(
+                Recipe.id.in_([m["recipe_id"] for m in matches])
+            )
+        }
+        return make_response(
+            [
+                dict(
+                    recipes[m["recipe_id"]].to_dict(
+                        only=("id", "title", "description", "meal_type", "image_url")
+                    ),
+                    matched=m["matched"],
+                    missing=m["missing"],
+                    coverage=m["coverage"],
+                )
+                for m in matches
+                if m["recipe_id"] in recipes
+            ],
+            200,
+        )
+
+
+class SimilarRecipes(Resource):
+    def get(self, id):
+        matches = similar_recipes.similar(id, page_limit())
+        if matches is None:
+            if db.session.get(Recipe, id) is None:
+                return {"error": "Recipe not found"}, 404
+            matches = []
+
+        recipes = {
+            recipe.id: recipe
+            for recipe in Recipe.query.filter(
+                Recipe.id.in_([m["recipe_id"] for m in matches])
+            )
+        }
+        items = [
+            dict(
+                serializers.RECIPE(recipes[m["recipe_id"]], RECIPE_SUMMARY_FIELDS),
+                similarity=m["similarity"],
+            )
+            for m in matches
+            if m["recipe_id"] in recipes
+        ]
+        return serializers.json_response(mark_favorites(items))
+
+
+class UserRecommendations(Resource):
+    def get(self, id):
+        if db.session.get(User, id) is None:
+            return {"error": "User not found"}, 404
+        matches = recommender.recommend(id, page_limit())
 
-        return make_response(jsonify(new_recipe.to_dict()), 201)
+        recipes = {
+            recipe.id: recipe
+            for recipe in Recipe.query.filter(
+                Recipe.id.in_([m["recipe_id"] for m in matches])
+            )
+        }
+        items = [
+            dict(
+                serializers.RECIPE(recipes[m["recipe_id"]], RECIPE_SUMMARY_FIELDS),
+                score=m["score"],
+            )
+            for m in matches
+            if m["recipe_id"] in recipes
+        ]
+        return serializers.json_response(mark_favorites(items))
 
 
 class RecipesById(Resource):
+    @response_cache.cached(lambda id: (f"recipe:{id}",))
     def get(self, id):
-        recipe = Recipe.query.get(id)
+        recipe = Recipe.query.options(*load_plans.RECIPE).get(id)
         if recipe:
             return recipe.to_dict(), 200
         return {"error": "Recipe not found"}, 404
@@ -259,7 +515,11 @@ class RecipesById(Resource):
 
             db.session.add(recipe)
             db.session.commit()
-            return make_response(recipe.to_dict(), 200)
+            response_cache.invalidate("recipes", f"recipe:{id}", f"ratings:{id}")
+            recipe = (
+                Recipe.query.options(*load_plans.RECIPE).populate_existing().get(id)
+            )
+            return serializers.json_response(serializers.RECIPE(recipe))
 
         except ValueError:
             return make_response({"errors": ["validation errors"]}, 400)
@@ -271,76 +531,96 @@ class RecipesById(Resource):
 
         db.session.delete(recipe)
         db.session.commit()
+        response_cache.invalidate("recipes", f"recipe:{id}", f"ratings:{id}")
 
         return {"message": "Recipe deleted successfully"}, 204
 
 
 class Ingredients(Resource):
+    @response_cache.cached(lambda: ("ingredients",))
     def get(self):
-        return make_response(
-            [ingredient.to_dict() for ingredient in Ingredient.query.all()], 200
+        return serializers.json_response(
+            serializers.INGREDIENT.many(
+                Ingredient.query.all(), serializers.requested_fields()
+            )
         )
 
 
 class FavoriteRecipes(Resource):
 
     def post(self, user_id, recipe_id):
-        user = User.query.get(user_id)
-        recipe = Recipe.query.get(recipe_id)
-
-        if not user or not recipe:
+        """Toggle: favorite the recipe, or unfavorite it if already favorited."""
+        if not db.session.get(User, user_id) or not db.session.get(Recipe, recipe_id):
             return {"error": "User or recipe not found"}, 404
 
-        if recipe_id in user.favorite_recipes:
-            user.favorite_recipes.remove(recipe_id)
-            return {"message": "Recipe unfavorited successfully"}, 200
+        favorite = FavoriteRecipe.query.filter_by(
+            user_id=user_id, recipe_id=recipe_id
+        ).first()
+        if favorite:
+            db.session.delete(favorite)
+            message, status = "Recipe unfavorited successfully", 200
         else:
-            user.favorite_recipes.append(recipe)
-            return {"message": "Recipe favorited successfully"}, 201
+            db.session.add(FavoriteRecipe(user_id=user_id, recipe_id=recipe_id))
+            message, status = "Recipe favorited successfully", 201
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # A concurrent request favorited it first; the end state is the same
+            db.session.rollback()
+        response_cache.invalidate("recipes", f"recipe:{recipe_id}")
+        return {"message": message}, status
 
     def get(self, user_id):
-        # Check if user exists
-        user = User.query.get(user_id)
-        if not user:
+        """The user's favorite recipes, one joined query per page."""
+        if not db.session.get(User, user_id):
             return {"error": "User not found"}, 404
 
-        # Get user's favorite recipe IDs
-        favorite_recipe_ids = user.favorite_recipes
+        fields = serializers.requested_fields()
+        query = Recipe.query.join(
+            FavoriteRecipe, FavoriteRecipe.recipe_id == Recipe.id
+        ).filter(FavoriteRecipe.user_id == user_id)
+        if serializers.RECIPE.needs_relationships(fields):
+            query = query.options(*load_plans.RECIPE)
 
-        # Query favorite recipes
-        favorite_recipes = Recipe.query.filter(Recipe.id.in_(favorite_recipe_ids)).all()
+        try:
+            recipes, next_cursor = keyset_page(
+                query, [Recipe.id], request.args.get("after")
+            )
+        except ValueError as e:
+            return {"error": str(e)}, 400
 
-        return [recipe.to_dict() for recipe in favorite_recipes], 200
+        items = serializers.RECIPE.many(recipes, fields)
+        if user_id == session_user_id():
+            mark_favorites(items, fields, favorite_ids={r.id for r in recipes})
+        return page_response(serializers.json_response(items), next_cursor)
 
     def delete(self, user_id, recipe_id):
-        # Check if user exists
-        user = User.query.get(user_id)
-        if not user:
-            return {"error": "User not found"}, 404
-
-        # Check if recipe exists
-        recipe = Recipe.query.get(recipe_id)
-        if not recipe:
-            return {"error": "Recipe not found"}, 404
-
-        # Remove recipe from user's favorites
-        if recipe_id in user.favorite_recipes:
-            user.favorite_recipes.remove(recipe_id)
-            db.session.commit()
-            return {"message": "Recipe unfavorited successfully"}, 200
-        else:
-            return {"error": "Recipe is not favorited by the user"}, 400
+        # Through the session, not a bulk delete, so the flush hooks (sync
+        # tombstones) see it
+        favorite = FavoriteRecipe.query.filter_by(
+            user_id=user_id, recipe_id=recipe_id
+        ).first()
+        if favorite is None:
+            return {"error": "Recipe is not favorited by the user"}, 404
+        db.session.delete(favorite)
+        db.session.commit()
+        response_cache.invalidate("recipes", f"recipe:{recipe_id}")
+        return {"message": "Recipe unfavorited successfully"}, 200
 
 
 class RecipeRatings(Resource):
-
+    @response_cache.cached(lambda recipe_id: (f"ratings:{recipe_id}",))
     def get(self, recipe_id):
         recipe = Recipe.query.get(recipe_id)
 
         if not recipe:
             return {"error": "Recipe not found"}, 404
 
-        ratings = RecipeRating.query.filter_by(recipe_id=recipe_id).all()
+        ratings = (
+            RecipeRating.query.options(*load_plans.RECIPE_RATING)
+            .filter_by(recipe_id=recipe_id)
+            .all()
+        )
         return make_response([rating.to_dict() for rating in ratings], 200)
 
     def post(self, recipe_id):
@@ -355,20 +635,28 @@ class RecipeRatings(Resource):
         if not recipe:
             return {"error": "Recipe not found"}, 404
 
-        new_rating = RecipeRating(rating=rating_value, recipe=recipe, user_id=user_id)
-
         try:
+            new_rating = RecipeRating(
+                rating=rating_value, recipe=recipe, user_id=user_id
+            )
             db.session.add(new_rating)
             db.session.commit()
-
-            # Fetch all ratings for the recipe after adding the new rating
-            ratings = RecipeRating.query.filter_by(recipe_id=recipe_id).all()
-            ratings_data = [{"value": rating.rating} for rating in ratings]
-
-            return {"ratings": ratings_data}, 201
         except ValueError as e:
+            db.session.rollback()
             return {"error": f"Invalid rating value. {str(e)}"}, 400
 
+        response_cache.invalidate(
+            "recipes", f"recipe:{recipe_id}", f"ratings:{recipe_id}"
+        )
+
+        # The insert updated the recipe's aggregates in the same transaction
+        return {
+            "rating": new_rating.to_dict(only=("id", "rating", "recipe_id", "user_id")),
+            "rating_count": recipe.rating_count,
+            "rating_average": recipe.rating_average,
+            "rating_histogram": recipe.rating_histogram,
+        }, 201
+
 
 class Comments(Resource):
     def post(self, user_id, recipe_id):
@@ -384,35 +672,52 @@ class Comments(Resource):
         if not text:
             return {"error": "Comment text is required"}, 400
 
-        new_comment = Comment(text=text, user=user, recipe=recipe)
+        # Comments aren't linked to users in the schema, only to recipes
+        new_comment = Comment(text=text, recipe=recipe)
 
         try:
             db.session.add(new_comment)
             db.session.commit()
-            return make_response(new_comment.to_dict(), 201)
+            response_cache.invalidate("recipes", f"recipe:{recipe_id}")
+            recipe = (
+                Recipe.query.options(*load_plans.RECIPE)
+                .populate_existing()
+                .get(recipe_id)
+            )
+            return serializers.json_response(
+                {
+                    **serializers.COMMENT(new_comment),
+                    "recipe": serializers.RECIPE(recipe),
+                },
+                201,
+            )
         except ValueError:
             return make_response({"errors": ["Validation errors"]}, 400)
 
 
-class Profile(Resource):
-
-    def get(self, id):
-        profile = Profile.query.get(id)
-        if profile:
-            return profile.to_dict(), 200
-        return {"error": "Profile not found"}, 404
+# Not named Profile, which would shadow the model for the resources below
+class Profiles(Resource):
+    def get(self):
+        profiles = Profile.query.all()
+        return make_response([profile.to_dict() for profile in profiles], 200)
 
 
-# def get(self):
-#     profiles = Profile.query.all()
-#     return make_response([profile.to_dict() for profile in profiles], 200)
+def profile_cache_tags(profile_id):
+    """Tags of the cached responses that embed the profile: recipes list
+    it through their favorite_recipes."""
+    recipe_ids = db.session.query(FavoriteRecipe.recipe_id).filter_by(
+        profile_id=profile_id
+    )
+    return ["recipes"] + [
+        f"recipe:{recipe_id}" for (recipe_id,) in recipe_ids.distinct()
+    ]
 
 
 class ProfilesById(Resource):
     def get(self, id):
         profile = Profile.query.get(id)
         if profile:
-            return jsonify(profile.serialize()), 200
+            return profile.to_dict(), 200
         return {"error": "Profile not found"}, 404
 
     def patch(self, id):
@@ -431,7 +736,9 @@ class ProfilesById(Resource):
                     setattr(profile, attr, data[attr])
 
             db.session.commit()
-            return jsonify(profile.serialize()), 200
+            session_users.delete(profile.user_id)
+            response_cache.invalidate(*profile_cache_tags(profile.id))
+            return profile.to_dict(), 200
 
         except ValueError:
             return make_response({"errors": ["validation errors"]}, 400)
@@ -441,26 +748,174 @@ class ProfilesById(Resource):
         if not profile:
             return {"errors": "Profile not found"}, 404
 
+        # Its favorites are deleted with it, so look their recipes up first
+        tags = profile_cache_tags(profile.id)
         db.session.delete(profile)
         db.session.commit()
+        session_users.delete(profile.user_id)
+        response_cache.invalidate(*tags)
 
         return {"message": "Profile deleted successfully"}, 204
 
 
 class NewRecipes(Resource):
     def get(self):
-        # Calculate the date 24 hours ago from now
-        twenty_four_hours_ago = datetime.now() - timedelta(hours=24)
+        """Recipes created since ?since= (ISO 8601, UTC), default the last
+        24 hours, oldest first and paged on (created_at, id)."""
+        since = request.args.get("since")
+        try:
+            since = (
+                datetime.fromisoformat(since)
+                if since
+                else datetime.utcnow() - timedelta(hours=24)
+            )
+        except ValueError:
+            return {"error": "since must be an ISO 8601 timestamp"}, 400
+        if since.tzinfo is not None:
+            since = since.astimezone(timezone.utc).replace(tzinfo=None)
 
-        # Query recipes created after 24 hours ago
-        new_recipes = Recipe.query.filter(
-            Recipe.created_at >= twenty_four_hours_ago
-        ).all()
+        fields = serializers.requested_fields()
+        query = Recipe.query.filter(Recipe.created_at >= since)
+        if serializers.RECIPE.needs_relationships(fields):
+            query = query.options(*load_plans.RECIPE)
+
+        try:
+            recipes, next_cursor = keyset_page(
+                query, [Recipe.created_at, Recipe.id], request.args.get("after")
+            )
+        except ValueError as e:
+            return {"error": str(e)}, 400
+
+        return page_response(
+            serializers.json_response(
+                mark_favorites(serializers.RECIPE.many(recipes, fields), fields)
+            ),
+            next_cursor,
+        )
 
-        if new_recipes:
-            return make_response([recipe.to_dict() for recipe in new_recipes], 200)
-        else:
-            return {"message": "No new recipes found in the last 24 hours"}, 404
+
+class Bootstrap(Resource):
+    def get(self):
+        """Everything the home screen needs after login, in one response.
+
+        Replaces /check_session, /recipes, /ingredients and the user's
+        ratings and favorites requests. Favorites that are already on the
+        first recipes page reuse those loaded objects instead of being
+        fetched again. sync_token is where the client's /sync starts (null
+        where sync isn't supported).
+        """
+        user_id = session.get("user_id")
+        if not user_id:
+            return {}, 401
+        user = User.query.options(*load_plans.USER).filter(User.id == user_id).first()
+        if not user:
+            return {}, 401
+        # Read first, so changes made while this loads are in the next /sync
+        sync_token = current_token() if sync_supported() else None
+
+        recipes, next_cursor = keyset_page(
+            Recipe.query.options(*load_plans.RECIPE), [Recipe.id]
+        )
+
+        # Rating.user is this user, already in the session, so no join needed
+        ratings = RecipeRating.query.filter_by(user_id=user_id).all()
+
+        favorite_ids = [
+            recipe_id
+            for (recipe_id,) in db.session.query(FavoriteRecipe.recipe_id)
+            .filter_by(user_id=user_id)
+            .order_by(FavoriteRecipe.id)
+        ]
+        loaded = {recipe.id: recipe for recipe in recipes}
+        missing = [id for id in favorite_ids if id not in loaded]
+        if missing:
+            loaded.update(
+                (recipe.id, recipe)
+                for recipe in Recipe.query.options(*load_plans.RECIPE).filter(
+                    Recipe.id.in_(missing)
+                )
+            )
+
+        return serializers.json_response(
+            {
+                "user": serializers.USER(user),
+                "recipes": mark_favorites(
+                    serializers.RECIPE.many(recipes), favorite_ids=set(favorite_ids)
+                ),
+                "recipes_next_cursor": next_cursor,
+                "ingredients": serializers.INGREDIENT.many(Ingredient.query.all()),
+                "recipe_ratings": serializers.RECIPE_RATING.many(ratings),
+                "favorite_recipes": mark_favorites(
+                    serializers.RECIPE.many(
+                        loaded[id] for id in dict.fromkeys(favorite_ids) if id in loaded
+                    ),
+                    favorite_ids=set(favorite_ids),
+                ),
+                "sync_token": sync_token,
+            }
+        )
+
+
+class Sync(Resource):
+    def get(self):
+        """Rows changed since ?token=. Without a token, just the current
+        token: load everything (e.g. from /bootstrap), then sync from it."""
+        if not sync_supported():
+            return {"error": "Sync is only available on SQLite"}, 501
+        token = request.args.get("token")
+        if token is None:
+            return {"token": current_token(), "reset": True}, 200
+        try:
+            token = int(token)
+        except ValueError:
+            return {"error": "Invalid sync token"}, 400
+        if token < 0 or token > current_token():
+            # From another database (or a restored one): start over
+            return {"token": current_token(), "reset": True}, 200
+
+        limit = min(
+            request.args.get("limit", SYNC_PAGE_SIZE, type=int) or SYNC_PAGE_SIZE,
+            SYNC_PAGE_SIZE,
+        )
+        return serializers.json_response(changes_since(token, limit))
+
+
+class CacheStats(Resource):
+    method_decorators = [ops_only]
+
+    def get(self):
+        return response_cache.stats(), 200
+
+
+class HashingStats(Resource):
+    method_decorators = [ops_only]
+
+    def get(self):
+        return password_hasher.stats(), 200
+
+
+class QueryStats(Resource):
+    method_decorators = [ops_only]
+
+    def get(self):
+        sort = request.args.get("sort", "total")
+        if sort not in SORT_KEYS:
+            return {"error": f"sort must be one of {', '.join(SORT_KEYS)}"}, 400
+        top = min(request.args.get("top", 20, type=int) or 20, 200)
+        return statement_stats.report(top, sort), 200
+
+    def delete(self):
+        statement_stats.reset()
+        return {}, 204
+
+
+class Metrics(Resource):
+    method_decorators = [ops_only]
+
+    def get(self):
+        if not metrics.enabled:
+            return {"error": "Metrics are disabled"}, 404
+        return metrics.response()
 
 
 class SubmitJournalEntryForm(Resource):
@@ -481,37 +936,61 @@ class SubmitJournalEntryForm(Resource):
         # if not title or not content:
         #     return {"error": "Title and content are required fields"}, 400
 
-        if image_file:
-            filename = secure_filename(image_file.filename)
-            image_path = os.path.join(
-                app.config["UPLOAD_FOLDER"], "journal_images", filename
-            )
-            image_file.save(image_path)
+        if not image_file:
+            return {"error": "No image provided"}, 400
+        filename = image_store.save(image_file, JournalImage.FOLDER)
+        image = JournalImage.record(user_id, filename)
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # A concurrent upload of the same file recorded it first
+            db.session.rollback()
+            image = JournalImage.query.filter_by(
+                user_id=user_id, filename=filename
+            ).one()
 
         # Save the journal entry to the database here
 
-        return {"message": "Image added"}, 201
+        return {
+            "message": "Image added",
+            "image_filename": filename,
+            "image": serializers.JOURNAL_IMAGE(image),
+        }, 201
 
 
 class UploadedFile(Resource):
     def get(self, folder, filename):
-        try:
-            file_path = os.path.join(app.config["UPLOAD_FOLDER"], folder, filename)
-            return send_from_directory(
-                os.path.dirname(file_path), os.path.basename(file_path)
-            )
-        except Exception as e:
-            return {"error": str(e)}, 500
+        return image_store.send(folder, filename)
 
 
 class ImageList(Resource):
     def get(self):
+        """The current user's images, newest first."""
+        user_id = session.get("user_id")
+        if not user_id:
+            return {"error": "User not logged in"}, 401
+        if request.args.get("user_id", user_id, type=int) != user_id:
+            return {"error": "Not allowed to list another user's images"}, 403
+
         try:
-            folder_path = os.path.join(app.config["UPLOAD_FOLDER"], "journal_images")
-            filenames = os.listdir(folder_path)
-            return {"image_urls": filenames}, 200
-        except Exception as e:
-            return {"error": str(e)}, 500
+            images, next_cursor = keyset_page(
+                JournalImage.query.filter_by(user_id=user_id),
+                [JournalImage.created_at, JournalImage.id],
+                request.args.get("after"),
+                descending=True,
+            )
+        except ValueError as e:
+            return {"error": str(e)}, 400
+
+        return page_response(
+            serializers.json_response(
+                {
+                    "image_urls": [image.filename for image in images],
+                    "images": serializers.JOURNAL_IMAGE.many(images),
+                }
+            ),
+            next_cursor,
+        )
 
 
 api.add_resource(Login, "/login")
@@ -520,15 +999,30 @@ api.add_resource(CheckSession, "/check_session")
 api.add_resource(ClearSession, "/clear_session")
 api.add_resource(SignUp, "/signup")
 api.add_resource(UsersById, "/users/<int:id>")
+api.add_resource(UserRecommendations, "/users/<int:id>/recommendations")
 api.add_resource(Recipes, "/recipes")
+api.add_resource(RecipeSearch, "/recipes/search")
+api.add_resource(TopRatedRecipes, "/recipes/top-rated")
+api.add_resource(CookableRecipes, "/recipes/cook")
 api.add_resource(RecipesById, "/recipes/<int:id>")
+api.add_resource(SimilarRecipes, "/recipes/<int:id>/similar")
 api.add_resource(Ingredients, "/ingredients")
-api.add_resource(FavoriteRecipes, "/favorite_recipes/<int:user_id>/<int:recipe_id>")
+api.add_resource(
+    FavoriteRecipes,
+    "/favorite_recipes/<int:user_id>",
+    "/favorite_recipes/<int:user_id>/<int:recipe_id>",
+)
 api.add_resource(RecipeRatings, "/recipe_ratings/<int:recipe_id>")
 api.add_resource(Comments, "/users/<int:user_id>/recipes/<int:recipe_id>/comments")
-api.add_resource(Profile, "/profiles")
+api.add_resource(Profiles, "/profiles")
 api.add_resource(ProfilesById, "/profiles/<int:id>")
 api.add_resource(NewRecipes, "/new_recipes")
+api.add_resource(Bootstrap, "/bootstrap")
+api.add_resource(Sync, "/sync")
+api.add_resource(CacheStats, "/cache_stats")
+api.add_resource(HashingStats, "/hashing_stats")
+api.add_resource(QueryStats, "/query_stats")
+api.add_resource(Metrics, "/metrics")
 api.add_resource(SubmitJournalEntryForm, "/submit_journal_entry_form")
 api.add_resource(UploadedFile, "/uploads/<string:folder>/<string:filename>")
 api.add_resource(ImageList, "/uploads/journal_images")
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""Write throughput of each SQLite profile in database.SQLITE_PROFILES.
+
+Every writer thread inserts rows in small committed transactions, like
+concurrent API writes. Run from the server directory:
+
+    python benchmarks/db_profile_bench.py [--threads 8] [--writes 200]
+"""
+
+# Standard library imports
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+# Remote library imports
+from sqlalchemy import (  # noqa: E402
+    Column,
+    Float,
+    Integer,
+    MetaData,
+    Table,
+    create_engine,
+)
+from sqlalchemy.exc import OperationalError  # noqa: E402
+
+# Local imports
+from database import SQLITE_PROFILES, apply_sqlite_profile  # noqa: E402
+
+metadata = MetaData()
+ratings = Table(
+    "bench_ratings",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("recipe_id", Integer, nullable=False),
+    Column("rating", Float, nullable=False),
+)
+
+
+def run_profile(profile, threads, writes, rows_per_write):
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(f"sqlite:///{directory}/bench.db")
+        apply_sqlite_profile(engine, profile)
+        metadata.create_all(engine)
+
+        errors = []
+        committed = []
+
+        def writer(worker):
+            done = 0
+            for i in range(writes):
+                rows = [
+                    {"recipe_id": worker * writes + i, "rating": 4.0}
+                    for _ in range(rows_per_write)
+                ]
+                try:
+                    with engine.begin() as connection:
+                        connection.execute(ratings.insert(), rows)
+                    done += 1
+                except OperationalError as e:
+                    errors.append(str(e.orig))
+            committed.append(done)
+
+        workers = [threading.Thread(target=writer, args=(n,)) for n in range(threads)]
+        start = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - start
+        engine.dispose()
+
+    transactions = sum(committed)
+    print(
+        f"  {profile:<12} {transactions / elapsed:>9.0f} commits/s  "
+        f"{transactions:>6} committed  {len(errors):>5} failed"
+        + (f"  ({errors[0]})" if errors else "")
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--writes", type=int, default=200, help="per thread")
+    parser.add_argument("--rows", type=int, default=1, help="rows per commit")
+    args = parser.parse_args()
+
+    print(f"{args.threads} threads x {args.writes} commits of {args.rows} row(s):")
+    for profile in SQLITE_PROFILES:
+        run_profile(profile, args.threads, args.writes, args.rows)
+
+
+if __name__ == "__main__":
+    main()
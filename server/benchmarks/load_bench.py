@@ -0,0 +1,375 @@
+#!/usr/bin/env python3
+"""HTTP load benchmark for the API resources.
+
+Seeds a temporary SQLite database with seed_bulk, starts the app on a
+threaded local server in a subprocess and drives each endpoint's sample
+requests from --clients concurrent keep-alive connections for --duration
+seconds. Reports p50/p95/p99 latency, requests/s, SQL queries per request
+and the server's peak RSS for each endpoint. Endpoints registered with
+api.add_resource but missing from SAMPLES (mostly writes) are listed as
+skipped. Run from the server directory:
+
+    python benchmarks/load_bench.py [--recipes 20000] [--clients 8]
+        [--duration 5] [--only recipes,bootstrap] [--no-cache]
+        [--save NAME] [--compare NAME]
+
+--save NAME writes the results to benchmarks/baselines/NAME.json and
+--compare NAME prints the change against a saved run.
+"""
+
+# Standard library imports
+import argparse
+import hashlib
+import http.client
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+SERVER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+BASELINES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines")
+# The benchmark server's token for the stats and metrics endpoints
+OPS_TOKEN = "load-bench"
+sys.path.insert(0, SERVER_DIR)
+
+# (method, url, json body) per endpoint. {recipe}, {user} and {ingredient}
+# are replaced with random ids from the seeded data on every request.
+SAMPLES = {
+    "login": [("POST", "/login", {"username": "user{user}", "password": "password"})],
+    "checksession": [("GET", "/check_session", None)],
+    "usersbyid": [("GET", "/users/{user}", None)],
+    "recipes": [
+        ("GET", "/recipes", None),
+        ("GET", "/recipes?meal_type=lunch", None),
+        ("GET", "/recipes?user_id={user}", None),
+        ("GET", "/recipes?ingredient=ingredient%20{ingredient}", None),
+    ],
+    "recipesearch": [("GET", "/recipes/search?q=recipe%20{recipe}", None)],
+    "topratedrecipes": [("GET", "/recipes/top-rated", None)],
+    "cookablerecipes": [
+        ("GET", "/recipes/cook?ingredient_id={ingredient}&max_missing=2", None)
+    ],
+    "recipesbyid": [("GET", "/recipes/{recipe}", None)],
+    "similarrecipes": [("GET", "/recipes/{recipe}/similar", None)],
+    "userrecommendations": [("GET", "/users/{user}/recommendations", None)],
+    "ingredients": [("GET", "/ingredients", None)],
+    "favoriterecipes": [("GET", "/favorite_recipes/{user}", None)],
+    "reciperatings": [("GET", "/recipe_ratings/{recipe}", None)],
+    "newrecipes": [("GET", "/new_recipes", None)],
+    "bootstrap": [("GET", "/bootstrap", None)],
+    "sync": [("GET", "/sync?token=0&limit=100", None)],
+    "imagelist": [("GET", "/uploads/journal_images", None)],
+    "uploadedfile": [("GET", "/uploads/journal_images/{image}", None)],
+    "cachestats": [("GET", "/cache_stats", None)],
+    "hashingstats": [("GET", "/hashing_stats", None)],
+    "querystats": [("GET", "/query_stats", None)],
+    "metrics": [("GET", "/metrics", None)],
+}
+
+
+def serve(port, database, uploads, cache):
+    """Run the app for the benchmark; started by main() in a subprocess."""
+    os.environ["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{database}"
+    os.chdir(SERVER_DIR)
+
+    from flask import g
+    from werkzeug.serving import WSGIRequestHandler, make_server
+
+    from app import app
+
+    class Handler(WSGIRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, like a real front proxy
+
+        def log_request(self, *args):
+            pass
+
+    @app.after_request
+    def report_query_count(response):
+        response.headers["X-Query-Count"] = str(g.get("query_count", 0))
+        return response
+
+    app.config["RESPONSE_CACHE_ENABLED"] = cache
+    app.config["UPLOAD_FOLDER"] = uploads
+    app.config["OPS_TOKEN"] = OPS_TOKEN
+    make_server(
+        "127.0.0.1", port, app, threaded=True, request_handler=Handler
+    ).serve_forever()
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for(port, process, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            sys.exit("Server exited during startup")
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    sys.exit("Server did not start")
+
+
+def rss_mb(pid):
+    """Resident set size of `pid` in MiB, or None where /proc isn't available."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        return None
+    return None
+
+
+def request(connection, method, url, body, headers):
+    payload = json.dumps(body) if body is not None else None
+    if payload is not None:
+        headers = dict(headers, **{"Content-Type": "application/json"})
+    connection.request(method, url, body=payload, headers=headers)
+    response = connection.getresponse()
+    response.read()
+    return response
+
+
+def login(port):
+    connection = http.client.HTTPConnection("127.0.0.1", port)
+    response = request(
+        connection,
+        "POST",
+        "/login",
+        {"username": "user1", "password": "password"},
+        {},
+    )
+    connection.close()
+    if response.status != 200:
+        sys.exit(f"Login failed with {response.status}")
+    return response.getheader("Set-Cookie").split(";", 1)[0]
+
+
+def run_endpoint(port, pid, samples, ids, args, cookie):
+    """Hammer one endpoint; returns its result row."""
+    latencies = []
+    queries = []
+    errors = [0]
+    lock = threading.Lock()
+    headers = {"Cookie": cookie, "Authorization": f"Bearer {OPS_TOKEN}"}
+    stop = threading.Event()
+    peak = [rss_mb(pid)]
+
+    def sample_rss():
+        while not stop.wait(0.05):
+            current = rss_mb(pid)
+            if current is not None and (peak[0] is None or current > peak[0]):
+                peak[0] = current
+
+    def fill(template, rng):
+        values = {name: rng.choice(choices) for name, choices in ids.items()}
+        return template.format(**values)
+
+    def client(number):
+        rng = random.Random(number)
+        connection = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+        local_latencies, local_queries, local_errors = [], [], 0
+        deadline = time.monotonic() + args.duration
+        while time.monotonic() < deadline:
+            method, url, body = rng.choice(samples)
+            if body is not None:
+                body = {key: fill(value, rng) for key, value in body.items()}
+            started = time.perf_counter()
+            try:
+                response = request(connection, method, fill(url, rng), body, headers)
+            except (OSError, http.client.HTTPException):
+                local_errors += 1
+                connection.close()
+                connection = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+                continue
+            local_latencies.append(time.perf_counter() - started)
+            if response.status >= 500:
+                local_errors += 1
+            count = response.getheader("X-Query-Count")
+            if count is not None:
+                local_queries.append(int(count))
+        connection.close()
+        with lock:
+            latencies.extend(local_latencies)
+            queries.extend(local_queries)
+            errors[0] += local_errors
+
+    sampler = threading.Thread(target=sample_rss, daemon=True)
+    sampler.start()
+    clients = [threading.Thread(target=client, args=(n,)) for n in range(args.clients)]
+    started = time.perf_counter()
+    for thread in clients:
+        thread.start()
+    for thread in clients:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    stop.set()
+    sampler.join()
+
+    if not latencies:
+        return {"requests": 0, "errors": errors[0]}
+    cuts = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else None
+
+    def percentile(p):
+        return (cuts[p - 1] if cuts else latencies[0]) * 1000
+
+    return {
+        "requests": len(latencies),
+        "errors": errors[0],
+        "rps": len(latencies) / elapsed,
+        "p50_ms": percentile(50),
+        "p95_ms": percentile(95),
+        "p99_ms": percentile(99),
+        "queries": statistics.mean(queries) if queries else None,
+        "peak_rss_mb": peak[0],
+    }
+
+
+def print_results(results, baseline=None):
+    print(
+        f"\n{'endpoint':<18}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+        f"{'queries':>9}{'rss MB':>8}{'errors':>8}"
+        + ("   vs baseline (req/s, p95)" if baseline else "")
+    )
+    for endpoint, row in results.items():
+        if not row["requests"]:
+            print(f"{endpoint:<18}  no successful requests ({row['errors']} errors)")
+            continue
+        queries = "-" if row["queries"] is None else f"{row['queries']:.1f}"
+        line = (
+            f"{endpoint:<18}{row['rps']:>9.0f}{row['p50_ms']:>9.1f}"
+            f"{row['p95_ms']:>9.1f}{row['p99_ms']:>9.1f}{queries:>9}"
+            f"{row['peak_rss_mb'] or 0:>8.0f}{row['errors']:>8}"
+        )
+        old = (baseline or {}).get(endpoint)
+        if old and old.get("requests"):
+            line += (
+                f"   {(row['rps'] / old['rps'] - 1) * 100:+6.1f}%"
+                f" {(row['p95_ms'] / old['p95_ms'] - 1) * 100:+6.1f}%"
+            )
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--recipes", type=int, default=20000)
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=5, help="seconds each")
+    parser.add_argument("--only", help="comma-separated endpoint names")
+    parser.add_argument("--no-cache", action="store_true", help="disable ResponseCache")
+    parser.add_argument("--save", metavar="NAME")
+    parser.add_argument("--compare", metavar="NAME")
+    parser.add_argument("--serve", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--database", help=argparse.SUPPRESS)
+    parser.add_argument("--uploads", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        return serve(args.serve, args.database, args.uploads, not args.no_cache)
+
+    workdir = tempfile.TemporaryDirectory()
+    database = os.path.join(workdir.name, "bench.db")
+    uploads = os.path.join(workdir.name, "uploads")
+    os.environ["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{database}"
+
+    from app import api, app
+    from config import db
+    from seed_bulk import seed
+
+    print(f"Seeding {args.recipes} recipes...")
+    started = time.perf_counter()
+    with app.app_context():
+        db.create_all()
+        seed(args.recipes)
+        db.engine.dispose()
+    print(f"  done in {time.perf_counter() - started:.1f}s")
+
+    image = os.urandom(4096)
+    image_name = hashlib.sha256(image).hexdigest() + ".png"
+    os.makedirs(os.path.join(uploads, "journal_images"))
+    with open(os.path.join(uploads, "journal_images", image_name), "wb") as f:
+        f.write(image)
+
+    users = max(10, args.recipes // 10)
+    ids = {
+        "recipe": range(1, args.recipes + 1),
+        "user": range(1, users + 1),
+        "ingredient": range(1, max(20, args.recipes // 20) + 1),
+        "image": [image_name],
+    }
+
+    endpoints = sorted(api.endpoints)
+    if args.only:
+        endpoints = [e for e in endpoints if e in args.only.split(",")]
+    skipped = [e for e in endpoints if e not in SAMPLES]
+
+    port = free_port()
+    command = [
+        sys.executable,
+        os.path.abspath(__file__),
+        "--serve",
+        str(port),
+        "--database",
+        database,
+        "--uploads",
+        uploads,
+    ] + (["--no-cache"] if args.no_cache else [])
+    server = subprocess.Popen(command, cwd=SERVER_DIR)
+    try:
+        wait_for(port, server)
+        cookie = login(port)
+        results = {}
+        for endpoint in endpoints:
+            if endpoint in skipped:
+                continue
+            print(f"  {endpoint}...", flush=True)
+            results[endpoint] = run_endpoint(
+                port, server.pid, SAMPLES[endpoint], ids, args, cookie
+            )
+    finally:
+        server.terminate()
+        server.wait()
+
+    baseline = None
+    if args.compare:
+        with open(os.path.join(BASELINES_DIR, f"{args.compare}.json")) as f:
+            baseline = json.load(f)["results"]
+    print_results(results, baseline)
+    if skipped:
+        print(f"\nSkipped (no read-only sample): {', '.join(skipped)}")
+
+    if args.save:
+        os.makedirs(BASELINES_DIR, exist_ok=True)
+        path = os.path.join(BASELINES_DIR, f"{args.save}.json")
+        with open(path, "w") as f:
+            json.dump(
+                {
+                    "config": {
+                        "recipes": args.recipes,
+                        "clients": args.clients,
+                        "duration": args.duration,
+                        "cache": not args.no_cache,
+                    },
+                    "results": results,
+                },
+                f,
+                indent=2,
+            )
+        print(f"\nSaved to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""Per-object cost of SerializerMixin.to_dict vs the compiled serializers.
+
+Run from the server directory:
+
+    python benchmarks/serializer_bench.py [--recipes 500] [--repeat 5]
+"""
+
+# Standard library imports
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+# Local imports
+from models import (  # noqa: E402
+    User,
+    Recipe,
+    Ingredient,
+    Comment,
+    FavoriteRecipe,
+    RecipeRating,
+)
+import serializers  # noqa: E402
+
+
+def build_recipes(count):
+    """Transient recipes shaped like a typical listing, no database needed."""
+    users = [
+        User(id=i, username=f"user{i}", email=f"user{i}@example.com", avatar=None)
+        for i in range(1, 21)
+    ]
+    recipes = []
+    for i in range(1, count + 1):
+        recipe = Recipe(
+            id=i,
+            title=f"Recipe {i}",
+            description="A recipe used for benchmarking serialization.",
+            instructions="1. Mix.\n2. Cook.\n3. Serve.",
+            image_url=f"https://example.com/{i}.jpg",
+            meal_type=("breakfast", "lunch", "dinner")[i % 3],
+            user_id=users[i % 20].id,
+            rating_count=3,
+            rating_average=4.0,
+        )
+        for j in range(3):
+            user = users[(i + j) % 20]
+            recipe.recipe_ratings.append(
+                RecipeRating(id=i * 3 + j, rating=4, recipe_id=i, user=user)
+            )
+        for j in range(2):
+            recipe.comments.append(Comment(id=i * 2 + j, text="Tasty!", recipe_id=i))
+        recipe.favorite_recipes.append(
+            FavoriteRecipe(
+                id=i,
+                user=users[i % 20],
+                recipe_id=i,
+                timestamp=datetime(2024, 2, 14, 12, 0, 0),
+            )
+        )
+        recipes.append(recipe)
+    ingredients = [Ingredient(id=i, name=f"Ingredient {i}") for i in range(count)]
+    return recipes, ingredients
+
+
+def best_of(repeat, fn):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def report(label, count, seconds):
+    print(f"  {label:<36} {seconds * 1e6 / count:>9.1f} us/object")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--recipes", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    recipes, ingredients = build_recipes(args.recipes)
+    encoder = "orjson" if serializers.orjson is not None else "json"
+    sparse = frozenset(("id", "title", "meal_type"))
+
+    print(f"Recipe ({args.recipes} objects, best of {args.repeat}):")
+    report(
+        "to_dict",
+        args.recipes,
+        best_of(args.repeat, lambda: [r.to_dict() for r in recipes]),
+    )
+    report(
+        "compiled",
+        args.recipes,
+        best_of(args.repeat, lambda: serializers.RECIPE.many(recipes)),
+    )
+    report(
+        "compiled ?fields=id,title,meal_type",
+        args.recipes,
+        best_of(args.repeat, lambda: serializers.RECIPE.many(recipes, sparse)),
+    )
+    report(
+        "to_dict + json.dumps",
+        args.recipes,
+        best_of(args.repeat, lambda: json.dumps([r.to_dict() for r in recipes])),
+    )
+    report(
+        f"compiled + {encoder}",
+        args.recipes,
+        best_of(
+            args.repeat, lambda: serializers.dumps(serializers.RECIPE.many(recipes))
+        ),
+    )
+
+    print(f"Ingredient ({len(ingredients)} objects, best of {args.repeat}):")
+    report(
+        "to_dict",
+        len(ingredients),
+        best_of(args.repeat, lambda: [i.to_dict() for i in ingredients]),
+    )
+    report(
+        "compiled",
+        len(ingredients),
+        best_of(args.repeat, lambda: serializers.INGREDIENT.many(ingredients)),
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+# Standard library imports
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+# Remote library imports
+from flask import Response, current_app, request
+from flask_restful import unpack
+
+
+class LRUStore:
+    """Thread-safe in-process LRU map. Any object with the same get/set/
+    delete/clear methods can be passed to ResponseCache instead."""
+
+    def __init__(self, max_entries=512):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        """Store `value`, returning the keys evicted to make room."""
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            evicted = []
+            while len(self._entries) > self.max_entries:
+                evicted.append(self._entries.popitem(last=False)[0])
+            return evicted
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class TTLStore(LRUStore):
+    """LRUStore whose entries also expire `ttl` seconds after being set.
+
+    For per-process caches of data that other processes may change, where
+    local invalidation alone can't keep every copy fresh.
+    """
+
+    def __init__(self, max_entries=512, ttl=60):
+        super().__init__(max_entries)
+        self.ttl = ttl
+
+    def get(self, key):
+        entry = super().get(key)
+        if entry is None:
+            return None
+        expires, value = entry
+        if expires < time.monotonic():
+            self.delete(key)
+            return None
+        return value
+
+    def set(self, key, value):
+        return super().set(key, (time.monotonic() + self.ttl, value))
+
+
+class CachedResponse:
+    __slots__ = ("body", "status", "headers", "etag", "tags")
+
+    def __init__(self, body, status, headers, etag, tags):
+        self.body = body
+        self.status = status
+        self.headers = headers
+        self.etag = etag
+        self.tags = tags
+
+
+class ResponseCache:
+    """Caches GET responses by URL, with strong ETags and tag invalidation.
+
+    Decorate a Resource method with @cached(tags) where `tags` maps the
+    view's URL arguments to the tags the response depends on, and call
+    invalidate(*tags) from every write path that changes that data. If the
+    response also depends on something outside the URL (such as the session
+    user), pass `vary`, a callable whose result becomes part of the key.
+    """
+
+    # Headers that are recomputed per response rather than replayed
+    SKIP_HEADERS = {"content-length", "set-cookie", "etag"}
+
+    def __init__(self, app=None, api=None, store=None):
+        self.api = api
+        self.store = store
+        self._keys_by_tag = {}
+        self._tags_by_key = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        if app is not None:
+            self.init_app(app, api)
+
+    def init_app(self, app, api=None):
+        self.api = api or self.api
+        app.config.setdefault("RESPONSE_CACHE_ENABLED", True)
+        app.config.setdefault("RESPONSE_CACHE_SIZE", 512)
+        if self.store is None:
+            self.store = LRUStore(app.config["RESPONSE_CACHE_SIZE"])
+
+    @staticmethod
+    def _key(vary=None):
+        args = sorted(request.args.items(multi=True))
+        key = request.path + "?" + "&".join(f"{k}={v}" for k, v in args)
+        if vary is not None:
+            key += f"#{vary()}"
+        return key
+
+    @staticmethod
+    def _conditional(entry):
+        if request.if_none_match.contains(entry.etag):
+            response = Response(status=304)
+        else:
+            response = Response(entry.body, status=entry.status, headers=entry.headers)
+        response.set_etag(entry.etag)
+        return response
+
+    def _render(self, rv):
+        if isinstance(rv, Response):
+            return rv
+        data, code, headers = unpack(rv)
+        return self.api.make_response(data, code, headers=headers)
+
+    def cached(self, tags, vary=None):
+        def decorator(fn):
+            @wraps(fn)
+            def wrapper(resource, *args, **kwargs):
+                if not current_app.config["RESPONSE_CACHE_ENABLED"]:
+                    return fn(resource, *args, **kwargs)
+
+                key = self._key(vary)
+                entry = self.store.get(key)
+                if entry is not None:
+                    self.hits += 1
+                    return self._conditional(entry)
+
+                self.misses += 1
+                generation = self._generation
+                response = self._render(fn(resource, *args, **kwargs))
+                if response.status_code != 200 or response.direct_passthrough:
+                    return response
+
+                body = response.get_data()
+                entry = CachedResponse(
+                    body,
+                    response.status_code,
+                    [
+                        (name, value)
+                        for name, value in response.headers.items()
+                        if name.lower() not in self.SKIP_HEADERS
+                    ],
+                    hashlib.sha1(body).hexdigest(),
+                    tuple(tags(**kwargs)),
+                )
+                self._store(key, entry, generation)
+                return self._conditional(entry)
+
+            return wrapper
+
+        return decorator
+
+    def _store(self, key, entry, generation):
+        with self._lock:
+            # Something was invalidated while this response was being
+            # built, so it may already be stale; serve it but don't keep it.
+            if generation != self._generation:
+                return
+            for evicted in self.store.set(key, entry) or ():
+                self._forget(evicted)
+            self._tags_by_key[key] = entry.tags
+            for tag in entry.tags:
+                self._keys_by_tag.setdefault(tag, set()).add(key)
+
+    def _forget(self, key):
+        for tag in self._tags_by_key.pop(key, ()):
+            keys = self._keys_by_tag.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_tag[tag]
+
+    def invalidate(self, *tags):
+        with self._lock:
+            self._generation += 1
+            for tag in tags:
+                for key in list(self._keys_by_tag.get(tag, ())):
+                    self.store.delete(key)
+                    self._forget(key)
+                    self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self.store.clear()
+            self._keys_by_tag.clear()
+            self._tags_by_key.clear()
+            self.invalidations += 1
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.store),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else None,
+            "invalidations": self.invalidations,
+        }
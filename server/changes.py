@@ -0,0 +1,80 @@
+# Remote library imports
+from sqlalchemy import bindparam, event, inspect, text
+
+# Local imports
+from config import db
+from models import Recipe, RecipeAssociation
+
+ASSOCIATIONS_FOR = text(
+    "SELECT recipe_id, ingredient_id FROM recipe_associations "
+    "WHERE recipe_id IN :ids"
+).bindparams(bindparam("ids", expanding=True))
+
+_ingredient_listeners = []
+
+
+def attrs_changed(obj, *keys):
+    state = inspect(obj)
+    return any(state.attrs[key].history.has_changes() for key in keys)
+
+
+def touched_recipe_ids(session, *keys):
+    """Ids of recipes a flush is creating, deleting, or changing in `keys`.
+
+    Call from an after_flush hook, while session.new/dirty/deleted still
+    describe the flush. Adding or removing RecipeAssociation rows counts
+    as a change to their recipe.
+    """
+    recipe_ids = set()
+    for obj in session.new | session.deleted:
+        if isinstance(obj, Recipe):
+            recipe_ids.add(obj.id)
+        elif isinstance(obj, RecipeAssociation):
+            recipe_ids.add(obj.recipe_id)
+    for obj in session.dirty:
+        if isinstance(obj, Recipe) and attrs_changed(obj, *keys):
+            recipe_ids.add(obj.id)
+    recipe_ids.discard(None)
+    return recipe_ids
+
+
+def on_ingredients_changed(listener):
+    """Call `listener(changes)` after each commit that changes which
+    ingredients recipes use, with changes as {recipe_id: set of ingredient
+    ids, or None if the recipe was deleted or has none left}.
+
+    The new ingredient sets are read once per flush however many
+    listeners there are.
+    """
+    _ingredient_listeners.append(listener)
+    return listener
+
+
+@event.listens_for(db.session, "after_flush")
+def _collect_ingredient_changes(session, flush_context):
+    if not _ingredient_listeners:
+        return
+    recipe_ids = touched_recipe_ids(session, "ingredients_associations")
+    if not recipe_ids:
+        return
+    changes = session.info.setdefault("ingredient_changes", {})
+    for recipe_id in recipe_ids:
+        changes[recipe_id] = None
+    rows = session.connection().execute(ASSOCIATIONS_FOR, {"ids": list(recipe_ids)})
+    for recipe_id, ingredient_id in rows:
+        if changes[recipe_id] is None:
+            changes[recipe_id] = set()
+        changes[recipe_id].add(ingredient_id)
+
+
+@event.listens_for(db.session, "after_commit")
+def _apply_ingredient_changes(session):
+    changes = session.info.pop("ingredient_changes", None)
+    if changes:
+        for listener in _ingredient_listeners:
+            listener(changes)
+
+
+@event.listens_for(db.session, "after_rollback")
+def _discard_ingredient_changes(session):
+    session.info.pop("ingredient_changes", None)
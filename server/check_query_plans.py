@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""Fail when any API request makes SQLite scan a whole table it filters.
+
+Seeds a throwaway database with --recipes recipes (and proportionate
+users, ratings, comments and favorites), requests every route registered
+on the app, captures each SQL statement the request runs and checks its
+EXPLAIN QUERY PLAN. A statement with a WHERE clause whose plan reads a
+table with a plain SCAN (no index) is a failure; so are a request that
+answers with another status than its sample expects or runs more
+statements than its QUERY_BUDGET, and a route that has no sample request
+below. Exits non-zero on failures, so it can run in CI:
+
+    python check_query_plans.py [--recipes 2000] [--verbose]
+"""
+
+# Standard library imports
+import argparse
+import os
+import re
+import sys
+import tempfile
+
+# A private database; config.py reads this at import
+_db_dir = tempfile.TemporaryDirectory()
+os.environ["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{_db_dir.name}/plans.db"
+
+# Remote library imports
+from sqlalchemy import event  # noqa: E402
+
+# Local imports
+from app import app  # noqa: E402
+from config import db  # noqa: E402
+from models import FavoriteRecipe, RecipeRating  # noqa: E402
+from seed_bulk import seed  # noqa: E402
+
+# (method, url, json body, expected status) for each endpoint; ids refer to
+# seeded rows. Each runs logged in as user 1.
+SAMPLES = {
+    "index": [("GET", "/", None, 200)],
+    "login": [("POST", "/login", {"username": "user1", "password": "password"}, 200)],
+    "logout": [("DELETE", "/logout", None, 204)],
+    "checksession": [("GET", "/check_session", None, 200)],
+    "clearsession": [("DELETE", "/clear_session", None, 204)],
+    "signup": [
+        (
+            "POST",
+            "/signup",
+            {"username": "new", "email": "new@x", "password": "pw"},
+            201,
+        )
+    ],
+    "usersbyid": [
+        ("GET", "/users/2", None, 200),
+        ("PATCH", "/users/2", {"username": "renamed"}, 200),
+    ],
+    "recipes": [
+        ("GET", "/recipes", None, 200),
+        ("GET", "/recipes?meal_type=lunch", None, 200),
+        ("GET", "/recipes?user_id=3", None, 200),
+        ("GET", "/recipes?title=Recipe%2010", None, 200),
+        ("GET", "/recipes?ingredient=ingredient%205", None, 200),
+        (
+            "POST",
+            "/recipes",
+            {
+                "title": "New",
+                "description": "d",
+                "instructions": "i",
+                "meal_type": "lunch",
+                "user_id": 2,
+                "ingredients": ["ingredient 1", "brand new"],
+            },
+            201,
+        ),
+    ],
+    "recipesearch": [("GET", "/recipes/search?q=recipe", None, 200)],
+    "topratedrecipes": [("GET", "/recipes/top-rated", None, 200)],
+    "cookablerecipes": [
+        ("GET", "/recipes/cook?ingredients=ingredient%201,ingredient%202", None, 200)
+    ],
+    "recipesbyid": [
+        ("GET", "/recipes/5", None, 200),
+        ("PATCH", "/recipes/5", {"title": "Patched"}, 200),
+    ],
+    "similarrecipes": [("GET", "/recipes/5/similar", None, 200)],
+    "userrecommendations": [("GET", "/users/1/recommendations", None, 200)],
+    "ingredients": [("GET", "/ingredients", None, 200)],
+    "favoriterecipes": [
+        ("GET", "/favorite_recipes/1", None, 200),
+        ("POST", "/favorite_recipes/1/7", None, 201),
+        ("DELETE", "/favorite_recipes/1/7", None, 200),
+    ],
+    "reciperatings": [
+        ("GET", "/recipe_ratings/5", None, 200),
+        ("POST", "/recipe_ratings/5", {"user_id": 1, "rating": 4}, 201),
+    ],
+    "comments": [("POST", "/users/1/recipes/5/comments", {"text": "Nice"}, 201)],
+    "profiles": [("GET", "/profiles", None, 200)],
+    "profilesbyid": [("GET", "/profiles/1", None, 200)],
+    "newrecipes": [("GET", "/new_recipes", None, 200)],
+    "bootstrap": [("GET", "/bootstrap", None, 200)],
+    "sync": [("GET", "/sync", None, 200), ("GET", "/sync?token=0", None, 200)],
+    "cachestats": [("GET", "/cache_stats", None, 200)],
+    "hashingstats": [("GET", "/hashing_stats", None, 200)],
+    "querystats": [("GET", "/query_stats", None, 200)],
+    "metrics": [("GET", "/metrics", None, 200)],
+    "submitjournalentryform": [("GET", "/submit_journal_entry_form", None, 200)],
+    "uploadedfile": [("GET", "/uploads/journal_images/missing.png", None, 404)],
+    "imagelist": [("GET", "/uploads/journal_images", None, 200)],
+    "static": [],
+}
+
+# Sampled recipe given ratings and favorites from this many users, so a
+# request that loads them one row at a time goes over QUERY_BUDGET
+POPULAR_RECIPE = 5
+POPULAR_FANS = 40
+
+# Reading every row is the point of these, e.g. listing all ingredients
+EXPECTED_SCANS = {
+    ("ingredients", "ingredients"),
+    ("profiles", "profiles"),
+    ("sync", "change_log"),
+}
+
+# "SCAN recipes", but not "SCAN recipes USING INDEX ..." or an FTS table
+FULL_SCAN = re.compile(r"^SCAN (\w+)$")
+FILTERED = re.compile(r"\bWHERE\b", re.IGNORECASE)
+
+
+def capture(client, method, url, body):
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if not executemany:
+            statements.append((statement, parameters))
+
+    engine = db.engine
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        response = client.open(url, method=method, json=body)
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    return response.status_code, statements
+
+
+def make_popular(recipe_id, fans):
+    # Users 1-3 appear in the samples; seeded users' profile ids match theirs
+    fan_ids = range(10, 10 + fans)
+    rated = {
+        user_id
+        for (user_id,) in db.session.query(RecipeRating.user_id).filter_by(
+            recipe_id=recipe_id
+        )
+    }
+    favorited = {
+        user_id
+        for (user_id,) in db.session.query(FavoriteRecipe.user_id).filter_by(
+            recipe_id=recipe_id
+        )
+    }
+    for user_id in fan_ids:
+        if user_id not in rated:
+            db.session.add(RecipeRating(recipe_id=recipe_id, user_id=user_id, rating=4))
+        if user_id not in favorited:
+            db.session.add(
+                FavoriteRecipe(recipe_id=recipe_id, user_id=user_id, profile_id=user_id)
+            )
+    db.session.commit()
+
+
+def full_scans(statement, parameters):
+    """Tables `statement` reads without an index, per EXPLAIN QUERY PLAN."""
+    if not FILTERED.search(statement) or statement.lstrip().upper().startswith(
+        "INSERT"
+    ):
+        return []
+    connection = db.engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        rows = cursor.execute("EXPLAIN QUERY PLAN " + statement, parameters).fetchall()
+    finally:
+        connection.close()
+    return [m.group(1) for m in (FULL_SCAN.match(row[-1]) for row in rows) if m]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--recipes", type=int, default=2000)
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    app.config.update(
+        RESPONSE_CACHE_ENABLED=False,
+        HASHING_WORKERS=0,
+        RECOMMENDATIONS_BACKGROUND=False,
+        BCRYPT_LOG_ROUNDS=4,
+        UPLOAD_FOLDER=_db_dir.name,
+        OPS_TOKEN="check-query-plans",
+    )
+    failures = []
+    with app.app_context():
+        db.create_all()
+        # No ANALYZE afterwards: without statistics SQLite uses any index
+        # that fits, so a SCAN means there isn't one, rather than that the
+        # planner preferred scanning a small table.
+        seed(args.recipes)
+        make_popular(POPULAR_RECIPE, POPULAR_FANS)
+
+        client = app.test_client()
+        client.environ_base["HTTP_AUTHORIZATION"] = "Bearer check-query-plans"
+
+        endpoints = sorted({rule.endpoint for rule in app.url_map.iter_rules()})
+        for endpoint in endpoints:
+            if endpoint not in SAMPLES:
+                failures.append(f"{endpoint}: no sample request in SAMPLES")
+                continue
+            for method, url, body, expected in SAMPLES[endpoint]:
+                # Again for every sample: logout and clear_session end it
+                with client.session_transaction() as session:
+                    session["user_id"] = 1
+                status, statements = capture(client, method, url, body)
+                print(f"{method:6} {url}  -> {status}, {len(statements)} queries")
+                if status != expected:
+                    failures.append(f"{method} {url}: {status}, expected {expected}")
+                budget = app.config["QUERY_BUDGETS"].get(
+                    endpoint, app.config["QUERY_BUDGET"]
+                )
+                if len(statements) > budget:
+                    failures.append(
+                        f"{method} {url}: {len(statements)} queries (budget {budget})"
+                    )
+                for statement, parameters in statements:
+                    scans = [
+                        table
+                        for table in full_scans(statement, parameters)
+                        if (endpoint, table) not in EXPECTED_SCANS
+                    ]
+                    for table in scans:
+                        failures.append(f"{method} {url}: full scan of {table}")
+                    if scans or args.verbose:
+                        print("       " + " ".join(statement.split())[:200])
+
+    failures = list(dict.fromkeys(failures))
+    if failures:
+        print(f"\n{len(failures)} problem(s):")
+        for failure in failures:
+            print("  " + failure)
+        sys.exit(1)
+    print("\nNo unindexed scans; every request within its query budget.")
+
+
+if __name__ == "__main__":
+    main()
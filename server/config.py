@@ -5,39 +5,73 @@ import secrets
 from flask import Flask, session
 from flask_cors import CORS
 from flask_migrate import Migrate
-from flask_restful import Api
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy import MetaData
 from flask_bcrypt import Bcrypt
 import os
 
-
 # Local imports
+from query_budget import QueryBudget
+from query_stats import StatementStats
+from cache import ResponseCache, TTLStore
+from hashing import HashingBusy, PasswordHasher
+from metrics import Metrics
+from database import apply_sqlite_profile, database_uri, engine_options
+from storage import ImageStore
+from restful import Api
 
 # Instantiate app, set attributes
 app = Flask(__name__)
 
 app.config["SECRET_KEY"] = secrets.token_bytes(16)
-app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///app.db"
+app.config["SQLALCHEMY_DATABASE_URI"] = database_uri()
+app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options(
+    app.config["SQLALCHEMY_DATABASE_URI"]
+)
+app.config["DB_PROFILE"] = os.environ.get("DB_PROFILE", "production")
 app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
 app.config["UPLOAD_FOLDER"] = os.environ.get("UPLOAD_FOLDER", "uploads")
+app.config["SESSION_USER_CACHE_TTL"] = int(os.environ.get("SESSION_USER_CACHE_TTL", 60))
+app.config["METRICS_ENABLED"] = os.environ.get("METRICS_ENABLED", "1") != "0"
+# Bearer token for the stats and metrics endpoints; without one they're off
+app.config["OPS_TOKEN"] = os.environ.get("OPS_TOKEN")
+# Off (tests, scripts), recommendations are computed inline on request
+app.config.setdefault("RECOMMENDATIONS_BACKGROUND", True)
 
 app.json.compact = False
 
 # Define metadata, instantiate db
 metadata = MetaData(
     naming_convention={
+        "ix": "ix_%(column_0_label)s",
+        "uq": "uq_%(table_name)s_%(column_0_name)s",
         "fk": "fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s",
     }
 )
 db = SQLAlchemy(metadata=metadata)
 migrate = Migrate(app, db)
 db.init_app(app)
+with app.app_context():
+    apply_sqlite_profile(db.engine, app.config["DB_PROFILE"])
 bcrypt = Bcrypt(app)
+password_hasher = PasswordHasher(app)
+query_budget = QueryBudget(app)
+statement_stats = StatementStats(app)
+image_store = ImageStore(app)
 template_dir = os.path.join(os.path.dirname(__file__), "templates")
 app.template_folder = template_dir
 # Instantiate REST API
 api = Api(app)
+api.handled(HashingBusy)
+response_cache = ResponseCache(app, api)
+metrics = Metrics(app, api)
+metrics.register("hashing", password_hasher.stats)
+metrics.register("response_cache", response_cache.stats)
+metrics.register("images", image_store.stats)
+metrics.register("sql", statement_stats.summary)
+# Serialized users for /check_session by id. Each process has its own, so
+# edits made through another process show up within the TTL.
+session_users = TTLStore(1024, app.config["SESSION_USER_CACHE_TTL"])
 
 # Instantiate CORS
 CORS(app)
@@ -0,0 +1,71 @@
+# Standard library imports
+import os
+
+# Remote library imports
+from sqlalchemy import event
+
+# PRAGMAs applied to every new SQLite connection, by DB_PROFILE.
+#
+# "production" switches to write-ahead logging so readers don't block the
+# writer, waits up to busy_timeout ms for a lock instead of failing with
+# "database is locked", and only fsyncs at WAL checkpoints
+# (synchronous=NORMAL is still crash-safe in WAL mode). "safe" keeps
+# SQLite's own defaults.
+SQLITE_PROFILES = {
+    "safe": {},
+    "production": {
+        "journal_mode": "WAL",
+        "busy_timeout": 5000,
+        "synchronous": "NORMAL",
+        "mmap_size": 256 * 1024 * 1024,
+        "cache_size": -64 * 1024,  # negative means KiB, so 64 MiB
+        "temp_store": "MEMORY",
+    },
+}
+
+
+def database_uri():
+    uri = os.environ.get("SQLALCHEMY_DATABASE_URI", "sqlite:///app.db")
+    # Some hosts still hand out the scheme SQLAlchemy 1.4+ no longer accepts
+    if uri.startswith("postgres://"):
+        uri = "postgresql://" + uri[len("postgres://") :]
+    return uri
+
+
+def engine_options(uri):
+    """SQLALCHEMY_ENGINE_OPTIONS from DB_* environment variables."""
+    options = {}
+    if uri.startswith("sqlite"):
+        return options
+
+    options["pool_pre_ping"] = True
+    for option, variable in (
+        ("pool_size", "DB_POOL_SIZE"),
+        ("max_overflow", "DB_MAX_OVERFLOW"),
+        ("pool_timeout", "DB_POOL_TIMEOUT"),
+        ("pool_recycle", "DB_POOL_RECYCLE"),
+    ):
+        if os.environ.get(variable):
+            options[option] = int(os.environ[variable])
+    return options
+
+
+def apply_sqlite_profile(engine, profile):
+    """Run the profile's PRAGMAs on each connection `engine` opens."""
+    if profile not in SQLITE_PROFILES:
+        raise ValueError(
+            f"Unknown DB_PROFILE {profile!r}; expected one of "
+            + ", ".join(sorted(SQLITE_PROFILES))
+        )
+    if engine.dialect.name != "sqlite":
+        return
+    pragmas = SQLITE_PROFILES[profile]
+    if not pragmas:
+        return
+
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name} = {value}")
+        cursor.close()
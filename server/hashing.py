@@ -0,0 +1,150 @@
+# Standard library imports
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+
+# Remote library imports
+import bcrypt
+from werkzeug.exceptions import ServiceUnavailable
+
+# Local imports
+from metrics import timed
+
+
+class HashingBusy(ServiceUnavailable):
+    """Raised instead of queueing when the hashing pool is saturated."""
+
+    def __init__(self):
+        super().__init__(retry_after=1)
+        self.data = {"error": "Server is busy, please try again"}
+
+
+# Worker functions live at module level so the pool can pickle them. Each
+# returns wall-clock start/finish times so the caller can split queue wait
+# from hashing time.
+
+
+def _generate(password, rounds):
+    started = time.time()
+    hashed = bcrypt.hashpw(password, bcrypt.gensalt(rounds))
+    return hashed, started, time.time()
+
+
+def _check(hashed, password):
+    started = time.time()
+    matches = bcrypt.checkpw(password, hashed)
+    return matches, started, time.time()
+
+
+class PasswordHasher:
+    """Runs bcrypt in a bounded process pool, off the request threads.
+
+    At most HASHING_WORKERS hashes run at once and HASHING_QUEUE_LIMIT
+    more may wait; beyond that requests fail fast with HashingBusy (503)
+    rather than piling up behind a login burst (counted as rejected). A
+    request that waits longer than HASHING_TIMEOUT also gets HashingBusy
+    (counted as timed_out); it cancels its hash if it hasn't started, and
+    otherwise its slot stays taken until the hash finishes.
+    HASHING_WORKERS = 0 hashes inline, which is handy for tests and the
+    seed script.
+    """
+
+    def __init__(self, app=None):
+        self._executor = None
+        self._slots = None
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.completed = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.queue_wait = 0.0
+        self.hash_time = 0.0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault("HASHING_WORKERS", os.cpu_count() or 1)
+        app.config.setdefault("HASHING_QUEUE_LIMIT", 4 * app.config["HASHING_WORKERS"])
+        app.config.setdefault("HASHING_TIMEOUT", 10)
+        app.config.setdefault("BCRYPT_LOG_ROUNDS", 12)
+        self.config = app.config
+
+    def _pool(self):
+        # Created on first use so each server process gets its own pool;
+        # spawn rather than fork, since request threads may hold locks.
+        with self._lock:
+            if self._executor is None:
+                workers = self.config["HASHING_WORKERS"]
+                self._executor = ProcessPoolExecutor(
+                    max_workers=workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+                self._slots = threading.BoundedSemaphore(
+                    workers + self.config["HASHING_QUEUE_LIMIT"]
+                )
+            return self._executor
+
+    def _run(self, fn, *args):
+        submitted = time.time()
+        if not self.config["HASHING_WORKERS"]:
+            result, started, finished = fn(*args)
+        else:
+            executor = self._pool()
+            if not self._slots.acquire(blocking=False):
+                with self._stats_lock:
+                    self.rejected += 1
+                raise HashingBusy()
+            try:
+                future = executor.submit(fn, *args)
+            except BaseException:
+                self._slots.release()
+                raise
+            # The slot is freed when the work is, not when we stop waiting,
+            # so hashes abandoned on timeout still count against the bound
+            future.add_done_callback(lambda _: self._slots.release())
+            try:
+                result, started, finished = future.result(
+                    timeout=self.config["HASHING_TIMEOUT"]
+                )
+            except TimeoutError:
+                # Drops the hash if it's still queued; one already running
+                # keeps its slot until it finishes
+                future.cancel()
+                with self._stats_lock:
+                    self.timed_out += 1
+                raise HashingBusy()
+
+        with self._stats_lock:
+            self.completed += 1
+            self.queue_wait += max(0.0, started - submitted)
+            self.hash_time += finished - started
+        return result
+
+    def generate(self, password):
+        with timed("hash"):
+            hashed = self._run(
+                _generate, password.encode("utf-8"), self.config["BCRYPT_LOG_ROUNDS"]
+            )
+        return hashed.decode("utf-8")
+
+    def check(self, hashed, password):
+        with timed("hash"):
+            return self._run(_check, hashed.encode("utf-8"), password.encode("utf-8"))
+
+    def stats(self):
+        with self._stats_lock:
+            completed = self.completed
+            return {
+                "workers": self.config["HASHING_WORKERS"],
+                "completed": completed,
+                "rejected": self.rejected,
+                "timed_out": self.timed_out,
+                "queue_wait_seconds_total": self.queue_wait,
+                "hash_seconds_total": self.hash_time,
+                "queue_wait_seconds_avg": (
+                    self.queue_wait / completed if completed else None
+                ),
+                "hash_seconds_avg": self.hash_time / completed if completed else None,
+            }
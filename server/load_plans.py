@@ -0,0 +1,50 @@
+# Remote library imports
+from sqlalchemy.orm import joinedload, selectinload
+
+# Local imports
+from models import (
+    User,
+    Recipe,
+    FavoriteRecipe,
+    RecipeRating,
+)
+
+# Eager-loading options matching what each model's to_dict() walks, so a
+# serialized list costs a fixed number of SELECTs instead of one per row.
+# Pass them to .options(*PLAN) on the query that feeds the serializer.
+
+USER = (selectinload(User.journal_entries),)
+
+RECIPE = (
+    selectinload(Recipe.recipe_ratings)
+    .joinedload(RecipeRating.user)
+    .selectinload(User.journal_entries),
+    selectinload(Recipe.favorite_recipes).options(
+        joinedload(FavoriteRecipe.user).selectinload(User.journal_entries),
+        joinedload(FavoriteRecipe.profile),
+    ),
+    selectinload(Recipe.comments),
+    selectinload(Recipe.ingredients_associations),
+)
+
+RECIPE_RATING = (
+    joinedload(RecipeRating.user).selectinload(User.journal_entries),
+    joinedload(RecipeRating.recipe).options(
+        selectinload(Recipe.favorite_recipes).options(
+            joinedload(FavoriteRecipe.user).selectinload(User.journal_entries),
+            joinedload(FavoriteRecipe.profile),
+        ),
+        selectinload(Recipe.comments),
+        selectinload(Recipe.ingredients_associations),
+    ),
+)
+
+# The compiled serializers (serializers.py) walk less than to_dict() does,
+# so they need less.
+
+RECIPE_RATING_USER = (joinedload(RecipeRating.user).selectinload(User.journal_entries),)
+
+FAVORITE_RECIPE = (
+    joinedload(FavoriteRecipe.user).selectinload(User.journal_entries),
+    joinedload(FavoriteRecipe.profile),
+)
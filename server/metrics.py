@@ -0,0 +1,242 @@
+# Standard library imports
+import bisect
+import functools
+import threading
+import time
+from contextlib import contextmanager
+
+# Remote library imports
+from flask import Response, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+NAMESPACE = "nomable"
+DURATION_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+PHASES = ("sql", "serialize", "hash")
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class RequestTimings:
+    __slots__ = ("started", "phases", "timing")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = dict.fromkeys(PHASES, 0.0)
+        self.timing = False
+
+
+@contextmanager
+def timed(phase):
+    """Add the time spent in the block to `phase` for the current request.
+
+    SQL run inside the block (lazy loads while serializing, say) counts as
+    sql rather than `phase`, and nested blocks count once, towards the
+    outermost. Does nothing outside a request or with metrics disabled.
+    """
+    timings = g.get("timings") if has_request_context() else None
+    if timings is None or timings.timing:
+        yield
+        return
+
+    timings.timing = True
+    sql = timings.phases["sql"]
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        timings.phases[phase] += elapsed - (timings.phases["sql"] - sql)
+        timings.timing = False
+
+
+def _labels(names, values):
+    return ",".join(f'{name}="{value}"' for name, value in zip(names, values))
+
+
+class Histogram:
+    """A Prometheus histogram family; callers hold Metrics' lock."""
+
+    def __init__(self, name, help, labels, buckets):
+        self.name = f"{NAMESPACE}_{name}"
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self.series = {}
+
+    def observe(self, values, value):
+        series = self.series.get(values)
+        if series is None:
+            series = self.series[values] = [[0] * (len(self.buckets) + 1), 0.0]
+        # Bucket i counts values <= buckets[i]; the last one is +Inf
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for values, (counts, total) in sorted(self.series.items()):
+            labels = _labels(self.labels, values)
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                lines.append(
+                    f'{self.name}_bucket{{{labels},le="{bound}"}} {cumulative}'
+                )
+            lines.append(f"{self.name}_sum{{{labels}}} {total}")
+            lines.append(f"{self.name}_count{{{labels}}} {cumulative}")
+        return lines
+
+
+class Metrics:
+    """Per-endpoint request timings for Server-Timing and Prometheus.
+
+    Each request records its total latency, how many SQL statements it ran
+    (counted by QueryBudget, in g.query_count) and how long they took, and
+    time spent serializing and hashing passwords (see timed()). The breakdown is sent back in a Server-Timing
+    header (unless METRICS_SERVER_TIMING is off) and aggregated into
+    histograms per endpoint for GET /metrics, along with the stats of
+    anything passed to register(). With METRICS_ENABLED off no hooks or
+    listeners are installed, leaving timed() as the only cost.
+    """
+
+    def __init__(self, app=None, api=None):
+        self._lock = threading.Lock()
+        self._sources = {}
+        self.enabled = False
+        self.requests = {}
+        self.durations = Histogram(
+            "request_duration_seconds",
+            "Time from before_request to after_request.",
+            ("endpoint",),
+            DURATION_BUCKETS,
+        )
+        self.phases = Histogram(
+            "request_phase_seconds",
+            "Time each request spent running SQL, serializing and hashing.",
+            ("endpoint", "phase"),
+            DURATION_BUCKETS,
+        )
+        self.queries = Histogram(
+            "request_sql_queries",
+            "SQL statements run per request.",
+            ("endpoint",),
+            QUERY_BUCKETS,
+        )
+        if app is not None:
+            self.init_app(app, api)
+
+    def init_app(self, app, api=None):
+        app.config.setdefault("METRICS_ENABLED", True)
+        app.config.setdefault("METRICS_SERVER_TIMING", True)
+        self.config = app.config
+        self.enabled = app.config["METRICS_ENABLED"]
+        if not self.enabled:
+            return
+
+        app.before_request(self._start)
+        app.after_request(self._finish)
+        event.listen(Engine, "before_cursor_execute", self._before_query)
+        event.listen(Engine, "after_cursor_execute", self._after_query)
+        if api is not None:
+            # Flask-RESTful encodes the dicts resources return here
+            for mediatype, represent in list(api.representations.items()):
+                api.representations[mediatype] = self._timed(represent)
+
+    def register(self, name, stats):
+        """Export the numbers in `stats()` as nomable_<name>_<key> gauges."""
+        self._sources[name] = stats
+
+    @staticmethod
+    def _timed(represent):
+        @functools.wraps(represent)
+        def wrapper(*args, **kwargs):
+            with timed("serialize"):
+                return represent(*args, **kwargs)
+
+        return wrapper
+
+    @staticmethod
+    def _start():
+        g.timings = RequestTimings()
+
+    @staticmethod
+    def _before_query(conn, cursor, statement, parameters, context, executemany):
+        if has_request_context() and "timings" in g:
+            conn.info["query_started"] = time.perf_counter()
+
+    @staticmethod
+    def _after_query(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.pop("query_started", None)
+        if started is not None and has_request_context() and "timings" in g:
+            g.timings.phases["sql"] += time.perf_counter() - started
+
+    def _finish(self, response):
+        timings = g.pop("timings", None)
+        if timings is None:
+            return response
+
+        total = time.perf_counter() - timings.started
+        queries = g.get("query_count", 0)
+        endpoint = request.endpoint or "unmatched"
+        with self._lock:
+            key = (endpoint, str(response.status_code))
+            self.requests[key] = self.requests.get(key, 0) + 1
+            self.durations.observe((endpoint,), total)
+            self.queries.observe((endpoint,), queries)
+            for phase, seconds in timings.phases.items():
+                if seconds or phase == "sql":
+                    self.phases.observe((endpoint, phase), seconds)
+
+        if self.config["METRICS_SERVER_TIMING"]:
+            entries = [
+                f'sql;dur={timings.phases["sql"] * 1000:.2f};'
+                f'desc="{queries} {"query" if queries == 1 else "queries"}"'
+            ]
+            entries += [
+                f"{phase};dur={seconds * 1000:.2f}"
+                for phase, seconds in timings.phases.items()
+                if seconds and phase != "sql"
+            ]
+            entries.append(f"total;dur={total * 1000:.2f}")
+            response.headers["Server-Timing"] = ", ".join(entries)
+        return response
+
+    def render(self):
+        """Everything recorded so far, in the Prometheus text format."""
+        name = f"{NAMESPACE}_requests_total"
+        with self._lock:
+            lines = [
+                f"# HELP {name} Requests handled, by endpoint and status.",
+                f"# TYPE {name} counter",
+            ]
+            for values, count in sorted(self.requests.items()):
+                lines.append(
+                    f"{name}{{{_labels(('endpoint', 'status'), values)}}} {count}"
+                )
+            for histogram in (self.durations, self.phases, self.queries):
+                lines += histogram.render()
+
+        for source, stats in self._sources.items():
+            for key, value in stats().items():
+                if value is None:
+                    continue
+                gauge = f"{NAMESPACE}_{source}_{key}"
+                lines += [f"# TYPE {gauge} gauge", f"{gauge} {float(value)}"]
+        return "\n".join(lines) + "\n"
+
+    def response(self):
+        return Response(self.render(), mimetype=CONTENT_TYPE)
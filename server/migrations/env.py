@@ -1,4 +1,5 @@
 import logging
+import re
 from logging.config import fileConfig
 
 from flask import current_app
@@ -45,6 +46,18 @@ target_db = current_app.extensions['migrate'].db
 # ... etc.
 
 
+# The FTS5 search index (see search.py) and the shadow tables SQLite keeps
+# for it aren't in the models' metadata; without this, autogenerate would
+# drop them.
+UNMANAGED_TABLES = re.compile(r'recipe_search(_\w+)?$')
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    return not (
+        type_ == 'table' and compare_to is None and UNMANAGED_TABLES.match(name)
+    )
+
+
 def get_metadata():
     if hasattr(target_db, 'metadatas'):
         return target_db.metadatas[None]
@@ -65,7 +78,8 @@ def run_migrations_offline():
     """
     url = config.get_main_option("sqlalchemy.url")
     context.configure(
-        url=url, target_metadata=get_metadata(), literal_binds=True
+        url=url, target_metadata=get_metadata(), literal_binds=True,
+        include_object=include_object
     )
 
     with context.begin_transaction():
@@ -93,6 +107,7 @@ def run_migrations_online():
     conf_args = current_app.extensions['migrate'].configure_args
     if conf_args.get("process_revision_directives") is None:
         conf_args["process_revision_directives"] = process_revision_directives
+    conf_args.setdefault("include_object", include_object)
 
     connectable = get_engine()
 
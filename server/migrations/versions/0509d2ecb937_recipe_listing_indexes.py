@@ -0,0 +1,42 @@
+"""recipe listing indexes
+
+Revision ID: 0509d2ecb937
+Revises: 15e459c49928, 35d8bd86da06, e3b07dda1e92
+Create Date: 2026-10-18 09:12:41.503112
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0509d2ecb937'
+down_revision = ('15e459c49928', '35d8bd86da06', 'e3b07dda1e92')
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('recipes', schema=None) as batch_op:
+        batch_op.create_index('ix_recipes_meal_type_id', ['meal_type', 'id'], unique=False)
+        batch_op.create_index('ix_recipes_user_id_id', ['user_id', 'id'], unique=False)
+        batch_op.create_index('ix_recipes_title', ['title'], unique=False)
+
+    with op.batch_alter_table('ingredients', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_ingredients_name'), ['name'], unique=False)
+
+    with op.batch_alter_table('recipe_associations', schema=None) as batch_op:
+        batch_op.create_index('ix_recipe_associations_ingredient_id_recipe_id', ['ingredient_id', 'recipe_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('recipe_associations', schema=None) as batch_op:
+        batch_op.drop_index('ix_recipe_associations_ingredient_id_recipe_id')
+
+    with op.batch_alter_table('ingredients', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_ingredients_name'))
+
+    with op.batch_alter_table('recipes', schema=None) as batch_op:
+        batch_op.drop_index('ix_recipes_title')
+        batch_op.drop_index('ix_recipes_user_id_id')
+        batch_op.drop_index('ix_recipes_meal_type_id')
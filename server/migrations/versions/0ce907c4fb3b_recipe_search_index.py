@@ -0,0 +1,46 @@
+"""recipe search index
+
+Revision ID: 0ce907c4fb3b
+Revises: 0509d2ecb937
+Create Date: 2026-10-18 10:03:17.288410
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0ce907c4fb3b'
+down_revision = '0509d2ecb937'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # FTS5 is SQLite-only; other databases get no search table.
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+
+    op.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS recipe_search USING fts5("
+        "title, description, instructions, ingredients, "
+        "tokenize = 'porter unicode61')"
+    )
+    op.execute(
+        """
+        INSERT INTO recipe_search (rowid, title, description, instructions, ingredients)
+        SELECT r.id, r.title, r.description, r.instructions,
+               (SELECT group_concat(i.name, ' ')
+                  FROM recipe_associations ra
+                  JOIN ingredients i ON i.id = ra.ingredient_id
+                 WHERE ra.recipe_id = r.id)
+          FROM recipes r
+        """
+    )
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+
+    op.execute("DROP TABLE IF EXISTS recipe_search")
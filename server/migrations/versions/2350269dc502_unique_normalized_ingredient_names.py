@@ -0,0 +1,105 @@
+"""unique normalized ingredient names
+
+Revision ID: 2350269dc502
+Revises: 28b41f920d84
+Create Date: 2026-10-18 11:20:08.114873
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2350269dc502'
+down_revision = '28b41f920d84'
+branch_labels = None
+depends_on = None
+
+
+def normalize(name):
+    # Same rule as models.Ingredient.normalize
+    return " ".join((name or "").split()).casefold()
+
+
+def upgrade():
+    with op.batch_alter_table('ingredients', schema=None) as batch_op:
+        batch_op.drop_index('ix_ingredients_name')
+        batch_op.add_column(sa.Column('normalized_name', sa.String(), nullable=True))
+
+    # Backfill, then fold duplicates into the lowest id per normalized name.
+    connection = op.get_bind()
+    ingredients = sa.table('ingredients', sa.column('id'), sa.column('name'), sa.column('normalized_name'))
+    keep = {}
+    duplicates = {}
+    for id, name in connection.execute(sa.select(ingredients.c.id, ingredients.c.name).order_by(ingredients.c.id)):
+        normalized = normalize(name) or f"#{id}"
+        connection.execute(
+            ingredients.update().where(ingredients.c.id == id).values(normalized_name=normalized)
+        )
+        if normalized in keep:
+            duplicates[id] = keep[normalized]
+        else:
+            keep[normalized] = id
+
+    merged_recipe_ids = set()
+    for duplicate_id, keep_id in duplicates.items():
+        params = {'duplicate_id': duplicate_id, 'keep_id': keep_id}
+        merged_recipe_ids.update(
+            recipe_id for (recipe_id,) in connection.execute(
+                sa.text(
+                    "SELECT recipe_id FROM recipe_associations "
+                    "WHERE ingredient_id = :duplicate_id"
+                ),
+                params,
+            )
+        )
+        # Recipes that already use the kept ingredient just lose the duplicate
+        connection.execute(
+            sa.text(
+                "DELETE FROM recipe_associations WHERE ingredient_id = :duplicate_id "
+                "AND recipe_id IN (SELECT recipe_id FROM recipe_associations "
+                "WHERE ingredient_id = :keep_id)"
+            ),
+            params,
+        )
+        connection.execute(
+            sa.text(
+                "UPDATE recipe_associations SET ingredient_id = :keep_id "
+                "WHERE ingredient_id = :duplicate_id"
+            ),
+            params,
+        )
+        connection.execute(ingredients.delete().where(ingredients.c.id == duplicate_id))
+
+    # Recipes that used a merged duplicate still have its name in the
+    # search index (see search.reindex)
+    if merged_recipe_ids and connection.dialect.name == 'sqlite':
+        ids = sa.bindparam('ids', expanding=True)
+        connection.execute(
+            sa.text("DELETE FROM recipe_search WHERE rowid IN :ids").bindparams(ids),
+            {'ids': sorted(merged_recipe_ids)},
+        )
+        connection.execute(
+            sa.text(
+                "INSERT INTO recipe_search "
+                "(rowid, title, description, instructions, ingredients) "
+                "SELECT r.id, r.title, r.description, r.instructions, "
+                "(SELECT group_concat(i.name, ' ') "
+                "FROM recipe_associations ra "
+                "JOIN ingredients i ON i.id = ra.ingredient_id "
+                "WHERE ra.recipe_id = r.id) "
+                "FROM recipes r WHERE r.id IN :ids"
+            ).bindparams(ids),
+            {'ids': sorted(merged_recipe_ids)},
+        )
+
+    with op.batch_alter_table('ingredients', schema=None) as batch_op:
+        batch_op.alter_column('normalized_name', existing_type=sa.String(), nullable=False)
+        batch_op.create_unique_constraint('uq_ingredients_normalized_name', ['normalized_name'])
+
+
+def downgrade():
+    with op.batch_alter_table('ingredients', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_ingredients_normalized_name', type_='unique')
+        batch_op.drop_column('normalized_name')
+        batch_op.create_index('ix_ingredients_name', ['name'], unique=False)
@@ -0,0 +1,56 @@
+"""recipe rating aggregates
+
+Revision ID: 28b41f920d84
+Revises: 0ce907c4fb3b
+Create Date: 2026-10-18 10:41:55.907321
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '28b41f920d84'
+down_revision = '0ce907c4fb3b'
+branch_labels = None
+depends_on = None
+
+HISTOGRAM = ['ratings_1', 'ratings_2', 'ratings_3', 'ratings_4', 'ratings_5']
+
+
+def upgrade():
+    with op.batch_alter_table('recipes', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('rating_count', sa.Integer(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('rating_sum', sa.Float(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('rating_average', sa.Float(), nullable=True))
+        for column in HISTOGRAM:
+            batch_op.add_column(sa.Column(column, sa.Integer(), server_default='0', nullable=False))
+        batch_op.create_index('ix_recipes_top_rated', ['rating_average', 'rating_count', 'id'], unique=False)
+
+    # Backfill from the existing ratings, bucketing the same way as
+    # models._apply_rating (round half up, clamped to 1..5 stars).
+    stars = "MIN(5, MAX(1, CAST(rating + 0.5 AS INTEGER)))"
+    buckets = ",\n".join(
+        f"{column} = (SELECT COUNT(*) FROM recipe_ratings rr "
+        f"WHERE rr.recipe_id = recipes.id AND {stars} = {n})"
+        for n, column in enumerate(HISTOGRAM, start=1)
+    )
+    op.execute(
+        f"""
+        UPDATE recipes SET
+            rating_count = (SELECT COUNT(*) FROM recipe_ratings rr WHERE rr.recipe_id = recipes.id),
+            rating_sum = (SELECT COALESCE(SUM(rating), 0) FROM recipe_ratings rr WHERE rr.recipe_id = recipes.id),
+            rating_average = (SELECT AVG(rating) FROM recipe_ratings rr WHERE rr.recipe_id = recipes.id),
+            {buckets}
+        """
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('recipes', schema=None) as batch_op:
+        batch_op.drop_index('ix_recipes_top_rated')
+        for column in reversed(HISTOGRAM):
+            batch_op.drop_column(column)
+        batch_op.drop_column('rating_average')
+        batch_op.drop_column('rating_sum')
+        batch_op.drop_column('rating_count')
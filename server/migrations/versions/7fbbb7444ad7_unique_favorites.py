@@ -0,0 +1,31 @@
+"""unique favorites
+
+Revision ID: 7fbbb7444ad7
+Revises: 6933593f2ee0
+Create Date: 2026-10-18 15:40:26.905113
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7fbbb7444ad7'
+down_revision = '6933593f2ee0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # The old toggle could favorite a recipe twice; keep the first of each.
+    op.execute(
+        "DELETE FROM favorite_recipes WHERE id NOT IN ("
+        "SELECT MIN(id) FROM favorite_recipes GROUP BY user_id, recipe_id)"
+    )
+    with op.batch_alter_table('favorite_recipes', schema=None) as batch_op:
+        batch_op.create_unique_constraint(batch_op.f('uq_favorite_recipes_user_id'), ['user_id', 'recipe_id'])
+
+
+def downgrade():
+    with op.batch_alter_table('favorite_recipes', schema=None) as batch_op:
+        batch_op.drop_constraint(batch_op.f('uq_favorite_recipes_user_id'), type_='unique')
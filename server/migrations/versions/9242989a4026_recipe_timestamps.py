@@ -0,0 +1,54 @@
+"""recipe timestamps
+
+Revision ID: 9242989a4026
+Revises: ef80fedab22b
+Create Date: 2026-10-18 14:31:12.640275
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9242989a4026'
+down_revision = 'ef80fedab22b'
+branch_labels = None
+depends_on = None
+
+# Existing recipes have no creation time on record. A fixed time long
+# before this migration keeps them out of /new_recipes, which a backfill
+# with the migration time would fill with the whole catalog for a day.
+LEGACY_TIMESTAMP = datetime(2000, 1, 1)
+
+
+def upgrade():
+    with op.batch_alter_table('recipes', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('created_at', sa.DateTime(), nullable=True))
+        batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+
+    recipes = sa.table(
+        'recipes',
+        sa.column('created_at', sa.DateTime),
+        sa.column('updated_at', sa.DateTime),
+    )
+    op.execute(
+        recipes.update()
+        .where(recipes.c.created_at.is_(None))
+        .values(created_at=LEGACY_TIMESTAMP, updated_at=LEGACY_TIMESTAMP)
+    )
+
+    with op.batch_alter_table('recipes', schema=None) as batch_op:
+        batch_op.alter_column('created_at', existing_type=sa.DateTime(), nullable=False)
+        batch_op.alter_column('updated_at', existing_type=sa.DateTime(), nullable=False)
+        batch_op.create_index('ix_recipes_created_at_id', ['created_at', 'id'], unique=False)
+        batch_op.create_index('ix_recipes_updated_at_id', ['updated_at', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('recipes', schema=None) as batch_op:
+        batch_op.drop_index('ix_recipes_updated_at_id')
+        batch_op.drop_index('ix_recipes_created_at_id')
+        batch_op.drop_column('updated_at')
+        batch_op.drop_column('created_at')
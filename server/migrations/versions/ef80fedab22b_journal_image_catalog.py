@@ -0,0 +1,46 @@
+"""journal image catalog
+
+Revision ID: ef80fedab22b
+Revises: 2350269dc502
+Create Date: 2026-10-18 14:05:41.302518
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'ef80fedab22b'
+down_revision = '2350269dc502'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('journal_images',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('filename', sa.String(), nullable=False),
+    sa.Column('sha256', sa.String(length=64), nullable=False),
+    sa.Column('size', sa.Integer(), nullable=False),
+    sa.Column('width', sa.Integer(), nullable=True),
+    sa.Column('height', sa.Integer(), nullable=True),
+    sa.Column('content_type', sa.String(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], name=op.f('fk_journal_images_user_id_users')),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_id', 'filename', name=op.f('uq_journal_images_user_id'))
+    )
+    with op.batch_alter_table('journal_images', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_journal_images_filename'), ['filename'], unique=False)
+        batch_op.create_index('ix_journal_images_user_created', ['user_id', 'created_at', 'id'], unique=False)
+
+    # Existing files are cataloged by running reconcile_images.py
+
+
+def downgrade():
+    with op.batch_alter_table('journal_images', schema=None) as batch_op:
+        batch_op.drop_index('ix_journal_images_user_created')
+        batch_op.drop_index(batch_op.f('ix_journal_images_filename'))
+
+    op.drop_table('journal_images')
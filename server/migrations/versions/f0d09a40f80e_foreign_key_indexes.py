@@ -0,0 +1,57 @@
+"""foreign key indexes
+
+Revision ID: f0d09a40f80e
+Revises: 7fbbb7444ad7
+Create Date: 2026-10-18 16:12:53.774019
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f0d09a40f80e'
+down_revision = '7fbbb7444ad7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # favorite_recipes.user_id, recipe_associations.ingredient_id,
+    # recipes.user_id and journal_images.user_id are already covered by
+    # composite indexes that lead with them.
+    with op.batch_alter_table('comments', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_comments_recipe_id'), ['recipe_id'], unique=False)
+
+    with op.batch_alter_table('favorite_recipes', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_favorite_recipes_profile_id'), ['profile_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_favorite_recipes_recipe_id'), ['recipe_id'], unique=False)
+
+    with op.batch_alter_table('journal_entries', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_journal_entries_user_id'), ['user_id'], unique=False)
+
+    with op.batch_alter_table('profiles', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_profiles_user_id'), ['user_id'], unique=False)
+
+    with op.batch_alter_table('recipe_ratings', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_recipe_ratings_recipe_id'), ['recipe_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_recipe_ratings_user_id'), ['user_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('recipe_ratings', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_recipe_ratings_user_id'))
+        batch_op.drop_index(batch_op.f('ix_recipe_ratings_recipe_id'))
+
+    with op.batch_alter_table('profiles', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_profiles_user_id'))
+
+    with op.batch_alter_table('journal_entries', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_journal_entries_user_id'))
+
+    with op.batch_alter_table('favorite_recipes', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_favorite_recipes_recipe_id'))
+        batch_op.drop_index(batch_op.f('ix_favorite_recipes_profile_id'))
+
+    with op.batch_alter_table('comments', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_comments_recipe_id'))
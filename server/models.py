@@ -1,15 +1,14 @@
 from sqlalchemy_serializer import SerializerMixin
 from sqlalchemy.ext.associationproxy import association_proxy
-from sqlalchemy import Enum
+from sqlalchemy import Enum, case, event, inspect, update
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from datetime import datetime
 from sqlalchemy.orm import validates
 from sqlalchemy.ext.hybrid import hybrid_property
-from flask import current_app
-from werkzeug.utils import secure_filename
-import os
-
-from config import db, bcrypt
 
+from config import db, image_store, password_hasher
+from storage import variant_name
 
 recipe_ingredients = db.Table(
     "recipe_ingredients",
@@ -27,7 +26,9 @@ class JournalEntry(db.Model, SerializerMixin):
     content = db.Column(db.Text)
     image_filename = db.Column(db.String)  # Stores the filename of the uploaded image
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
-    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
+    user_id = db.Column(
+        db.Integer, db.ForeignKey("users.id"), nullable=False, index=True
+    )
 
     user = db.relationship("User", back_populates="journal_entries")
 
@@ -46,24 +47,63 @@ class JournalEntry(db.Model, SerializerMixin):
 
     def save_image(self, image_file):
         if image_file:
-            # Ensure the uploads folder exists
-            uploads_dir = os.path.join(
-                current_app.config["UPLOAD_FOLDER"], "journal_images"
-            )
-            os.makedirs(uploads_dir, exist_ok=True)
-            # Generate a secure filename
-            filename = secure_filename(image_file.filename)
-            # Save the image to the uploads folder
-            image_file.save(os.path.join(uploads_dir, filename))
-            # Update the image filename in the database
-            self.image_filename = filename
-
-    def get_image_url(self):
+            # Stored as "<sha256>.<ext>"; thumbnails are made in the background
+            self.image_filename = image_store.save(image_file, JournalImage.FOLDER)
+            JournalImage.record(self.user_id, self.image_filename)
+
+    def get_image_url(self, variant=None):
+        """URL of the original, or of a resized variant such as "thumb"."""
         if self.image_filename:
-            return f"/uploads/journal_images/{self.image_filename}"
+            filename = self.image_filename
+            if variant:
+                filename = variant_name(filename, variant)
+            return f"/uploads/journal_images/{filename}"
         return None
 
 
+class JournalImage(db.Model, SerializerMixin):
+    """Catalog row for an uploaded image, so listings don't scan the disk.
+
+    Identical uploads share one file, so several rows (one per owner) can
+    point at the same filename. user_id is NULL for files found on disk by
+    reconcile_images.py that no journal entry claims.
+    """
+
+    __tablename__ = "journal_images"
+    __table_args__ = (
+        db.UniqueConstraint("user_id", "filename"),
+        db.Index("ix_journal_images_user_created", "user_id", "created_at", "id"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    filename = db.Column(db.String, nullable=False, index=True)
+    sha256 = db.Column(db.String(64), nullable=False)
+    size = db.Column(db.Integer, nullable=False)
+    width = db.Column(db.Integer)
+    height = db.Column(db.Integer)
+    content_type = db.Column(db.String)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=True)
+
+    FOLDER = "journal_images"
+
+    @classmethod
+    def record(cls, user_id, filename):
+        """Add (or return the existing) catalog row for a user's upload."""
+        image = cls.query.filter_by(user_id=user_id, filename=filename).first()
+        if image is None:
+            image = cls(
+                user_id=user_id,
+                filename=filename,
+                **image_store.describe(cls.FOLDER, filename),
+            )
+            db.session.add(image)
+        return image
+
+    def __repr__(self):
+        return f"<JournalImage(id={self.id}, filename={self.filename}, user_id={self.user_id})>"
+
+
 class User(db.Model, SerializerMixin):
     __tablename__ = "users"
     id = db.Column(db.Integer, primary_key=True)
@@ -105,18 +145,14 @@ class User(db.Model, SerializerMixin):
 
     @password_hash.setter
     def password_hash(self, password):
-        password_hash = bcrypt.generate_password_hash(password.encode("utf-8"))
-        self._password_hash = password_hash.decode("utf-8")
+        self._password_hash = password_hasher.generate(password)
 
     def authenticate(self, password):
-        return bcrypt.check_password_hash(self._password_hash, password.encode("utf-8"))
+        return password_hasher.check(self._password_hash, password)
 
     def has_favorited(self, recipe):
-
-        return (
-            FavoriteRecipe.query.filter_by(user_id=self.id, recipe_id=recipe.id).first()
-            is not None
-        )
+        # For a single recipe; use FavoriteRecipe.favorited_ids for a list
+        return bool(FavoriteRecipe.favorited_ids(self.id, [recipe.id]))
 
     def __repr__(self):
         return f"<User(id={self.id}, email={self.email}, username={self.username}, avatar={self.avatar})>"
@@ -125,7 +161,9 @@ class User(db.Model, SerializerMixin):
 class Profile(db.Model, SerializerMixin):
     __tablename__ = "profiles"
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
+    user_id = db.Column(
+        db.Integer, db.ForeignKey("users.id"), nullable=False, index=True
+    )
     avatar = db.Column(db.String, nullable=True)
     user = db.relationship("User", back_populates="profile")
     favorite_recipes = db.relationship(
@@ -151,6 +189,21 @@ class Recipe(db.Model, SerializerMixin):
         Enum("breakfast", "lunch", "dinner", name="meal_type"), nullable=False
     )
     user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    updated_at = db.Column(
+        db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow
+    )
+
+    # Rating aggregates, maintained by the RecipeRating mapper events below
+    rating_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    rating_sum = db.Column(db.Float, nullable=False, default=0, server_default="0")
+    rating_average = db.Column(db.Float, nullable=True)
+    # Histogram: how many ratings round to 1, 2, 3, 4 and 5 stars
+    ratings_1 = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    ratings_2 = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    ratings_3 = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    ratings_4 = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    ratings_5 = db.Column(db.Integer, nullable=False, default=0, server_default="0")
 
     user = db.relationship("User", back_populates="recipes")
     favorite_recipes = db.relationship("FavoriteRecipe", back_populates="recipe")
@@ -170,19 +223,41 @@ class Recipe(db.Model, SerializerMixin):
         "Comment", back_populates="recipe", cascade="all, delete-orphan"
     )
 
+    __table_args__ = (
+        db.Index("ix_recipes_meal_type_id", "meal_type", "id"),
+        db.Index("ix_recipes_user_id_id", "user_id", "id"),
+        db.Index("ix_recipes_title", "title"),
+        db.Index("ix_recipes_top_rated", "rating_average", "rating_count", "id"),
+        db.Index("ix_recipes_created_at_id", "created_at", "id"),
+        db.Index("ix_recipes_updated_at_id", "updated_at", "id"),
+    )
+
     serialize_rules = (
         "-user",
         "-favorite_recipes.recipe",
         "-recipe_ratings.recipe",
         "-comments.recipe",
         "-ingredients",
+        "-rating_sum",
+        "-ratings_1",
+        "-ratings_2",
+        "-ratings_3",
+        "-ratings_4",
+        "-ratings_5",
     )
 
+    @property
+    def rating_histogram(self):
+        return {
+            str(stars): getattr(self, f"ratings_{stars}") or 0 for stars in range(1, 6)
+        }
+
 
 class Ingredient(db.Model, SerializerMixin):
     __tablename__ = "ingredients"
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String)
+    normalized_name = db.Column(db.String, nullable=False, unique=True)
 
     recipes_associations = db.relationship(
         "RecipeAssociation", back_populates="ingredient", cascade="all, delete-orphan"
@@ -193,6 +268,70 @@ class Ingredient(db.Model, SerializerMixin):
         creator=lambda recipe: RecipeAssociation(recipe=recipe),
     )
 
+    serialize_rules = ("-normalized_name",)
+
+    @staticmethod
+    def normalize(name):
+        """Collapse case and whitespace so "Fresh  Basil" matches "fresh basil"."""
+        return " ".join(name.split()).casefold()
+
+    @validates("name")
+    def validate_name(self, _, name):
+        if not name or not name.strip():
+            raise ValueError("Ingredient name cannot be blank.")
+        name = " ".join(name.split())
+        self.normalized_name = Ingredient.normalize(name)
+        return name
+
+    @classmethod
+    def resolve(cls, names):
+        """Find or create the ingredients called `names`, in order.
+
+        One INSERT ... ON CONFLICT DO NOTHING for the whole list followed
+        by one SELECT ... IN, so the cost doesn't grow with the number of
+        ingredients and concurrent requests can't create duplicates. Raises
+        ValueError unless `names` is a list of strings.
+        """
+        if not isinstance(names, list) or not all(
+            isinstance(name, str) for name in names
+        ):
+            raise ValueError("Ingredients must be a list of names.")
+        wanted = {}
+        for name in names:
+            if name.strip():
+                wanted.setdefault(cls.normalize(name), " ".join(name.split()))
+        if not wanted:
+            return []
+
+        rows = [
+            {"name": name, "normalized_name": normalized}
+            for normalized, name in wanted.items()
+        ]
+        dialect = db.session.get_bind().dialect.name
+        if dialect in ("sqlite", "postgresql"):
+            insert = sqlite_insert if dialect == "sqlite" else postgresql_insert
+            db.session.execute(
+                insert(cls)
+                .values(rows)
+                .on_conflict_do_nothing(index_elements=["normalized_name"])
+            )
+        else:
+            existing = {
+                normalized
+                for (normalized,) in db.session.query(cls.normalized_name).filter(
+                    cls.normalized_name.in_(wanted)
+                )
+            }
+            missing = [row for row in rows if row["normalized_name"] not in existing]
+            if missing:
+                db.session.execute(cls.__table__.insert(), missing)
+
+        found = {
+            ingredient.normalized_name: ingredient
+            for ingredient in cls.query.filter(cls.normalized_name.in_(wanted))
+        }
+        return [found[normalized] for normalized in wanted]
+
     def __repr__(self):
         return f"<Ingredient(id={self.id}, name={self.name})>"
 
@@ -207,12 +346,22 @@ class RecipeAssociation(db.Model):
     recipe = db.relationship("Recipe", back_populates="ingredients_associations")
     ingredient = db.relationship("Ingredient", back_populates="recipes_associations")
 
+    __table_args__ = (
+        db.Index(
+            "ix_recipe_associations_ingredient_id_recipe_id",
+            "ingredient_id",
+            "recipe_id",
+        ),
+    )
+
 
 class Comment(db.Model, SerializerMixin):
     __tablename__ = "comments"
     id = db.Column(db.Integer, primary_key=True)
     text = db.Column(db.Text)
-    recipe_id = db.Column(db.Integer, db.ForeignKey("recipes.id"), nullable=False)
+    recipe_id = db.Column(
+        db.Integer, db.ForeignKey("recipes.id"), nullable=False, index=True
+    )
 
     recipe = db.relationship("Recipe", back_populates="comments", single_parent=True)
 
@@ -231,13 +380,31 @@ class FavoriteRecipe(db.Model, SerializerMixin):
     id = db.Column(db.Integer, primary_key=True)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
     user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
-    recipe_id = db.Column(db.Integer, db.ForeignKey("recipes.id"), nullable=False)
-    profile_id = db.Column(db.Integer, db.ForeignKey("profiles.id"), nullable=True)
+    recipe_id = db.Column(
+        db.Integer, db.ForeignKey("recipes.id"), nullable=False, index=True
+    )
+    profile_id = db.Column(
+        db.Integer, db.ForeignKey("profiles.id"), nullable=True, index=True
+    )
 
     user = db.relationship("User", back_populates="favorite_recipes")
     recipe = db.relationship("Recipe", back_populates="favorite_recipes")
     profile = db.relationship("Profile", back_populates="favorite_recipes")
 
+    # Also serves lookups by user_id alone, and by user_id + recipe_id IN (...)
+    __table_args__ = (db.UniqueConstraint("user_id", "recipe_id"),)
+
+    @classmethod
+    def favorited_ids(cls, user_id, recipe_ids):
+        """Which of `recipe_ids` the user has favorited, in one query."""
+        recipe_ids = list(recipe_ids)
+        if not user_id or not recipe_ids:
+            return set()
+        rows = db.session.query(cls.recipe_id).filter(
+            cls.user_id == user_id, cls.recipe_id.in_(recipe_ids)
+        )
+        return {recipe_id for (recipe_id,) in rows}
+
     @validates("user_id", "recipe_id")
     def validate_user_recipe_ids(self, key, value):
         if value is None:
@@ -252,8 +419,12 @@ class RecipeRating(db.Model, SerializerMixin):
     __tablename__ = "recipe_ratings"
     id = db.Column(db.Integer, primary_key=True)
     rating = db.Column(db.Float, nullable=False)
-    recipe_id = db.Column(db.Integer, db.ForeignKey("recipes.id"), nullable=False)
-    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
+    recipe_id = db.Column(
+        db.Integer, db.ForeignKey("recipes.id"), nullable=False, index=True
+    )
+    user_id = db.Column(
+        db.Integer, db.ForeignKey("users.id"), nullable=False, index=True
+    )
 
     recipe = db.relationship(
         "Recipe", back_populates="recipe_ratings", single_parent=True
@@ -271,6 +442,71 @@ class RecipeRating(db.Model, SerializerMixin):
         return f"<RecipeRating(id={self.id}, recipe_id={self.recipe_id}, user_id={self.user_id})>"
 
 
+def _apply_rating(connection, recipe_id, value, sign):
+    # One UPDATE against the recipe row inside the flush's transaction, so
+    # rating a recipe costs the same no matter how many ratings it has.
+    # The right-hand sides read the pre-update values.
+    stars = min(5, max(1, int(value + 0.5)))
+    bucket = getattr(Recipe, f"ratings_{stars}")
+    count = Recipe.rating_count + sign
+    total = Recipe.rating_sum + sign * value
+    connection.execute(
+        update(Recipe)
+        .where(Recipe.id == recipe_id)
+        .values(
+            {
+                Recipe.rating_count: count,
+                Recipe.rating_sum: total,
+                Recipe.rating_average: case((count > 0, total / count), else_=None),
+                bucket: bucket + sign,
+            }
+        )
+    )
+
+
+@event.listens_for(RecipeRating, "after_insert")
+def _rating_inserted(mapper, connection, target):
+    _apply_rating(connection, target.recipe_id, target.rating, 1)
+
+
+@event.listens_for(RecipeRating, "after_delete")
+def _rating_deleted(mapper, connection, target):
+    _apply_rating(connection, target.recipe_id, target.rating, -1)
+
+
+@event.listens_for(RecipeRating, "after_update")
+def _rating_updated(mapper, connection, target):
+    state = inspect(target)
+    rating = state.attrs.rating.history
+    recipe_id = state.attrs.recipe_id.history
+    if not (rating.has_changes() or recipe_id.has_changes()):
+        return
+    old_rating = rating.deleted[0] if rating.deleted else target.rating
+    old_recipe_id = recipe_id.deleted[0] if recipe_id.deleted else target.recipe_id
+    _apply_rating(connection, old_recipe_id, old_rating, -1)
+    _apply_rating(connection, target.recipe_id, target.rating, 1)
+
+
+class ChangeLog(db.Model):
+    """One row per changed (or deleted) row of a synced table; see sync.py.
+
+    The autoincrementing id is the sync token, so it must only grow: never
+    reset the sequence or reuse ids.
+    """
+
+    __tablename__ = "change_log"
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    entity = db.Column(db.String(32), nullable=False)
+    entity_id = db.Column(db.Integer, nullable=False)
+    deleted = db.Column(db.Boolean, nullable=False, default=False)
+    changed_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = ({"sqlite_autoincrement": True},)
+
+    def __repr__(self):
+        return f"<ChangeLog(id={self.id}, entity={self.entity}, entity_id={self.entity_id})>"
+
+
 # from sqlalchemy_serializer import SerializerMixin
 # from sqlalchemy.ext.associationproxy import association_proxy
 # from sqlalchemy import Enum
@@ -0,0 +1,93 @@
+# Standard library imports
+import base64
+import json
+from datetime import datetime, timezone
+from urllib.parse import urlencode
+
+# Remote library imports
+from flask import request
+from sqlalchemy import DateTime, tuple_
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def page_limit():
+    """Read ?limit= from the request, clamped to MAX_PAGE_SIZE."""
+    limit = request.args.get("limit", DEFAULT_PAGE_SIZE, type=int)
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def encode_cursor(values):
+    values = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    raw = json.dumps(values, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor, columns):
+    """Turn an opaque ?after= cursor back into values for `columns`.
+
+    Returns None when the cursor is missing, raises ValueError when it is
+    malformed.
+    """
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+        if not isinstance(values, list) or len(values) != len(columns):
+            raise ValueError("Invalid cursor")
+        return [_decode_value(column, value) for column, value in zip(columns, values)]
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+
+
+def _decode_value(column, value):
+    if not isinstance(column.type, DateTime) or value is None:
+        return value
+    if not isinstance(value, str):
+        raise TypeError("Expected an ISO timestamp")
+    # fromisoformat() only accepts a "Z" suffix from Python 3.11
+    if value.endswith("Z"):
+        value = value[:-1] + "+00:00"
+    value = datetime.fromisoformat(value)
+    if value.tzinfo is not None:
+        # Timestamps are stored as naive UTC
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def keyset_page(query, columns, cursor=None, limit=None, descending=False):
+    """Fetch one page of `query` ordered by `columns`.
+
+    `columns` must be unique together (end with the primary key) so the
+    cursor identifies exactly one row. Returns (rows, next_cursor) where
+    next_cursor is None on the last page.
+    """
+    limit = limit or page_limit()
+    after = decode_cursor(cursor, columns)
+
+    if after is not None:
+        key = columns[0] if len(columns) == 1 else tuple_(*columns)
+        value = after[0] if len(columns) == 1 else tuple_(*after)
+        query = query.filter(key < value if descending else key > value)
+
+    order_by = [column.desc() for column in columns] if descending else columns
+    rows = query.order_by(*order_by).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor([getattr(last, c.key) for c in columns])
+    return rows, next_cursor
+
+
+def page_response(response, next_cursor):
+    """Attach the continuation cursor to a list response."""
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+        args = request.args.to_dict()
+        args["after"] = next_cursor
+        response.headers["Link"] = f'<{request.path}?{urlencode(args)}>; rel="next"'
+    return response
@@ -0,0 +1,196 @@
+# Standard library imports
+import threading
+import time
+from array import array
+from bisect import bisect_left, insort
+from collections import Counter
+
+# Remote library imports
+from flask import current_app
+from sqlalchemy import text
+
+# Local imports
+from config import db
+from changes import on_ingredients_changed
+
+ALL_ASSOCIATIONS = text("SELECT recipe_id, ingredient_id FROM recipe_associations")
+
+
+class IngredientSetIndex:
+    """Base for in-memory indexes over each recipe's set of ingredient ids.
+
+    Subclasses implement _build(by_recipe), returning the index's state
+    for {recipe_id: set of ingredient ids}; _install(state), which makes
+    it current; and _apply(changes), which updates the current state for
+    {recipe_id: ingredient ids, or None if deleted}.
+
+    The index is built on first use and kept current through
+    on_ingredients_changed. After `max_age` seconds the next request
+    starts a reload from the database in a background thread, to pick up
+    writes from other worker processes; requests keep using the current
+    index meanwhile, and changes committed during the reload are replayed
+    onto the new one.
+    """
+
+    name = "ingredient-set-index"
+
+    def __init__(self, max_age=300):
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._loaded_at = None
+        # Changes made while a background reload runs, else None
+        self._reloading = None
+        on_ingredients_changed(self.update)
+
+    @staticmethod
+    def _read():
+        by_recipe = {}
+        for recipe_id, ingredient_id in db.session.execute(ALL_ASSOCIATIONS):
+            by_recipe.setdefault(recipe_id, set()).add(ingredient_id)
+        return by_recipe
+
+    def ensure_loaded(self):
+        with self._lock:
+            if self._loaded_at is None:
+                # Nothing to answer from yet, so the first load is inline
+                self._install(self._build(self._read()))
+                self._loaded_at = time.monotonic()
+                return
+            if (
+                self._reloading is not None
+                or time.monotonic() - self._loaded_at <= self.max_age
+            ):
+                return
+            self._reloading = {}
+        threading.Thread(
+            target=self._reload,
+            args=(current_app._get_current_object(),),
+            name=self.name,
+            daemon=True,
+        ).start()
+
+    def _reload(self, app):
+        try:
+            with app.app_context():
+                by_recipe = self._read()
+                db.session.remove()
+            state = self._build(by_recipe)
+        except Exception:
+            app.logger.exception("Reloading the %s failed", self.name)
+            state = None
+
+        with self._lock:
+            if state is not None:
+                self._install(state)
+                self._apply(self._reloading)
+            # After a failure, retry once the index is due again
+            self._reloading = None
+            self._loaded_at = time.monotonic()
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded_at = None
+
+    def update(self, changes):
+        """Apply {recipe_id: ingredient ids or None if deleted}."""
+        with self._lock:
+            if self._loaded_at is None:
+                return
+            self._apply(changes)
+            if self._reloading is not None:
+                self._reloading.update(changes)
+
+
+class IngredientIndex(IngredientSetIndex):
+    """In-memory inverted index from ingredient id to the recipes using it.
+
+    Each ingredient maps to sorted arrays of the recipe ids using it, one
+    per recipe size (number of ingredients), so a rare ingredient costs a
+    few bytes rather than a bit per recipe in the catalog. match() counts
+    how many of the pantry's ingredients each candidate uses in C (Counter
+    over the arrays), and only the best `limit` of each size get scored.
+    """
+
+    name = "ingredient-index"
+
+    def __init__(self, max_age=300):
+        super().__init__(max_age)
+        self._by_recipe = {}
+        self._postings = {}
+
+    @staticmethod
+    def _build(by_recipe):
+        postings = {}
+        for recipe_id in sorted(by_recipe):
+            ingredient_ids = by_recipe[recipe_id]
+            for ingredient_id in ingredient_ids:
+                postings.setdefault(ingredient_id, {}).setdefault(
+                    len(ingredient_ids), array("I")
+                ).append(recipe_id)
+        return {rid: tuple(ids) for rid, ids in by_recipe.items()}, postings
+
+    def _install(self, state):
+        self._by_recipe, self._postings = state
+
+    def _apply(self, changes):
+        for recipe_id, ingredient_ids in changes.items():
+            old = self._by_recipe.pop(recipe_id, ())
+            for ingredient_id in old:
+                by_size = self._postings[ingredient_id]
+                recipe_ids = by_size[len(old)]
+                del recipe_ids[bisect_left(recipe_ids, recipe_id)]
+                if not recipe_ids:
+                    del by_size[len(old)]
+                    if not by_size:
+                        del self._postings[ingredient_id]
+            if ingredient_ids:
+                self._by_recipe[recipe_id] = tuple(ingredient_ids)
+                for ingredient_id in ingredient_ids:
+                    insort(
+                        self._postings.setdefault(ingredient_id, {}).setdefault(
+                            len(ingredient_ids), array("I")
+                        ),
+                        recipe_id,
+                    )
+
+    def match(self, ingredient_ids, limit, max_missing=None):
+        """Recipes using any of `ingredient_ids`, best coverage first.
+
+        Returns dicts with recipe_id, matched, missing and coverage (the
+        fraction of the recipe's ingredients on hand), ordered by fewest
+        missing ingredients, then highest coverage.
+        """
+        self.ensure_loaded()
+
+        # How many of the ingredients each candidate uses, by recipe size
+        matched_by_size = {}
+        with self._lock:
+            for ingredient_id in set(ingredient_ids):
+                for size, recipe_ids in self._postings.get(ingredient_id, {}).items():
+                    counts = matched_by_size.get(size)
+                    if counts is None:
+                        counts = matched_by_size[size] = Counter()
+                    counts.update(recipe_ids)
+
+        # Among recipes of one size, more matched means fewer missing and
+        # higher coverage, so the overall best are among each size's best
+        results = []
+        for size, counts in matched_by_size.items():
+            for recipe_id, matched in counts.most_common(limit):
+                missing = size - matched
+                if max_missing is not None and missing > max_missing:
+                    break
+                results.append(
+                    {
+                        "recipe_id": recipe_id,
+                        "matched": matched,
+                        "missing": missing,
+                        "coverage": matched / size,
+                    }
+                )
+
+        results.sort(key=lambda r: (r["missing"], -r["coverage"], r["recipe_id"]))
+        return results[:limit]
+
+
+ingredient_index = IngredientIndex()
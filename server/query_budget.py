@@ -0,0 +1,50 @@
+# Remote library imports
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class QueryBudget:
+    """Counts the SQL statements each request issues.
+
+    In testing (or with QUERY_BUDGET_ENFORCE set) a request that runs more
+    than QUERY_BUDGET statements raises QueryBudgetExceeded, so an N+1
+    regression fails the test that exercises it. Individual endpoints can
+    be given their own limit in QUERY_BUDGETS, keyed by endpoint name.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault("QUERY_BUDGET", 20)
+        app.config.setdefault("QUERY_BUDGETS", {})
+        app.config.setdefault("QUERY_BUDGET_ENFORCE", False)
+
+        event.listen(Engine, "before_cursor_execute", self._count)
+        app.after_request(self._check)
+
+    @staticmethod
+    def _count(conn, cursor, statement, parameters, context, executemany):
+        if has_request_context():
+            g.query_count = g.get("query_count", 0) + 1
+
+    @staticmethod
+    def _check(response):
+        config = current_app.config
+        if not (current_app.testing or config["QUERY_BUDGET_ENFORCE"]):
+            return response
+
+        budget = config["QUERY_BUDGETS"].get(request.endpoint, config["QUERY_BUDGET"])
+        count = g.get("query_count", 0)
+        if count > budget:
+            raise QueryBudgetExceeded(
+                f"{request.method} {request.path} issued {count} queries "
+                f"(budget {budget})"
+            )
+        return response
@@ -0,0 +1,213 @@
+# Standard library imports
+import hashlib
+import os
+import random
+import re
+import threading
+import time
+import traceback
+from collections import deque
+from datetime import datetime, timezone
+
+# Remote library imports
+from flask import current_app, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Local imports
+from cache import LRUStore
+
+SERVER_DIR = os.path.dirname(os.path.abspath(__file__))
+STRING = re.compile(r"'(?:[^']|'')*'")
+NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+# "IN (?, ?, ?)" from expanding parameters, and multi-row VALUES lists
+PARAMETER_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+VALUES_LIST = re.compile(r"\(\?\)(?:\s*,\s*\(\?\))+")
+WHITESPACE = re.compile(r"\s+")
+OTHER = "(other statements)"
+SORT_KEYS = {
+    "total": lambda entry: entry["total"],
+    "count": lambda entry: entry["count"],
+    "max": lambda entry: entry["max"],
+    "mean": lambda entry: entry["total"] / entry["count"],
+    "rows": lambda entry: entry["rows"] or 0,
+}
+
+
+def fingerprint(statement):
+    """`statement` with literals and parameter lists collapsed to ?, so
+    every run of the same query has the same text."""
+    statement = STRING.sub("?", statement)
+    statement = NUMBER.sub("?", statement)
+    statement = PARAMETER_LIST.sub("(?)", statement)
+    statement = VALUES_LIST.sub("(?)", statement)
+    return WHITESPACE.sub(" ", statement).strip()
+
+
+def _resource():
+    """Name of the Resource (or view) handling the current request."""
+    if not has_request_context():
+        return "-"
+    view = current_app.view_functions.get(request.endpoint)
+    view_class = getattr(view, "view_class", None)
+    if view_class is not None:
+        return view_class.__name__
+    return request.endpoint or "-"
+
+
+def _stack():
+    """The app's own frames leading to the current statement."""
+    return [
+        f"{os.path.relpath(frame.filename, SERVER_DIR)}:{frame.lineno} in {frame.name}"
+        for frame in traceback.extract_stack()
+        if frame.filename.startswith(SERVER_DIR)
+        and os.path.basename(frame.filename) != "query_stats.py"
+    ]
+
+
+class StatementStats:
+    """Aggregates every SQL statement the app runs by its fingerprint.
+
+    For each fingerprint it keeps the count, total and max time, rows
+    affected and which Resources issued it. Rows come from the driver's
+    rowcount, which SQLite only reports for writes, so for reads they
+    stay None rather than claiming 0. Statements slower than
+    QUERY_STATS_SLOW_SECONDS are logged, with the Resource and, for a
+    QUERY_STATS_STACK_SAMPLE fraction of them, the app's part of the call
+    stack, and the last few are kept for report(). Parameters are never
+    recorded. At most QUERY_STATS_MAX_FINGERPRINTS distinct statements are
+    tracked; the rest are lumped together.
+    """
+
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        self._fingerprints = LRUStore(1024)
+        self.entries = {}
+        self.slow = deque(maxlen=50)
+        self.slow_total = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault("QUERY_STATS_ENABLED", True)
+        app.config.setdefault("QUERY_STATS_SLOW_SECONDS", 0.1)
+        app.config.setdefault("QUERY_STATS_STACK_SAMPLE", 0.1)
+        app.config.setdefault("QUERY_STATS_MAX_FINGERPRINTS", 500)
+        self.config = app.config
+        self.logger = app.logger
+        if not app.config["QUERY_STATS_ENABLED"]:
+            return
+
+        event.listen(Engine, "before_cursor_execute", self._before)
+        event.listen(Engine, "after_cursor_execute", self._after)
+
+    @staticmethod
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info["stats_started"] = time.perf_counter()
+
+    def _after(self, conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.pop("stats_started", None)
+        if started is None:
+            return
+        elapsed = time.perf_counter() - started
+        resource = _resource()
+
+        # Statements repeat verbatim (SQLAlchemy caches the compiled SQL),
+        # so the regexes run once per distinct statement
+        text = self._fingerprints.get(statement)
+        if text is None:
+            text = fingerprint(statement)
+            self._fingerprints.set(statement, text)
+
+        with self._lock:
+            entry = self.entries.get(text)
+            if entry is None:
+                if len(self.entries) >= self.config["QUERY_STATS_MAX_FINGERPRINTS"]:
+                    text = OTHER
+                entry = self.entries.setdefault(
+                    text,
+                    {
+                        "count": 0,
+                        "total": 0.0,
+                        "max": 0.0,
+                        "rows": None,
+                        "resources": {},
+                    },
+                )
+            entry["count"] += 1
+            entry["total"] += elapsed
+            entry["max"] = max(entry["max"], elapsed)
+            if cursor.rowcount >= 0:
+                entry["rows"] = (entry["rows"] or 0) + cursor.rowcount
+            entry["resources"][resource] = entry["resources"].get(resource, 0) + 1
+
+        if elapsed >= self.config["QUERY_STATS_SLOW_SECONDS"]:
+            self._log_slow(statement, elapsed, resource)
+
+    def _log_slow(self, statement, elapsed, resource):
+        stack = None
+        if random.random() < self.config["QUERY_STATS_STACK_SAMPLE"]:
+            stack = _stack()
+        where = f"{request.method} {request.path}" if has_request_context() else None
+        entry = {
+            "at": datetime.now(timezone.utc).isoformat(),
+            "ms": elapsed * 1000,
+            "resource": resource,
+            "request": where,
+            "statement": WHITESPACE.sub(" ", statement).strip(),
+            "stack": stack,
+        }
+        with self._lock:
+            self.slow.append(entry)
+            self.slow_total += 1
+        self.logger.warning(
+            "Slow query (%.1f ms) in %s%s: %s%s",
+            elapsed * 1000,
+            resource,
+            f" [{where}]" if where else "",
+            WHITESPACE.sub(" ", statement).strip()[:1000],
+            "".join(f"\n    {frame}" for frame in stack or ()),
+        )
+
+    def report(self, top=20, sort="total"):
+        """The `top` fingerprints by `sort` (one of SORT_KEYS), plus the
+        most recent slow queries."""
+        with self._lock:
+            entries = sorted(
+                self.entries.items(),
+                key=lambda item: SORT_KEYS[sort](item[1]),
+                reverse=True,
+            )[:top]
+            statements = [
+                {
+                    "id": hashlib.sha1(text.encode("utf-8")).hexdigest()[:12],
+                    "statement": text,
+                    "count": entry["count"],
+                    "total_ms": entry["total"] * 1000,
+                    "mean_ms": entry["total"] / entry["count"] * 1000,
+                    "max_ms": entry["max"] * 1000,
+                    "rows": entry["rows"],
+                    "resources": dict(entry["resources"]),
+                }
+                for text, entry in entries
+            ]
+            return {
+                "fingerprints": len(self.entries),
+                "statements": statements,
+                "slow": list(reversed(self.slow)),
+            }
+
+    def summary(self):
+        with self._lock:
+            return {
+                "fingerprints": len(self.entries),
+                "statements": sum(e["count"] for e in self.entries.values()),
+                "seconds_total": sum(e["total"] for e in self.entries.values()),
+                "slow": self.slow_total,
+            }
+
+    def reset(self):
+        with self._lock:
+            self.entries.clear()
+            self.slow.clear()
+            self.slow_total = 0
@@ -0,0 +1,402 @@
+# Standard library imports
+import threading
+import time
+from itertools import chain
+
+# Remote library imports
+from flask import current_app
+from sqlalchemy import bindparam, event, inspect, text
+from werkzeug.exceptions import ServiceUnavailable
+
+try:
+    import numpy as np
+except ImportError:  # optional, /users/<id>/recommendations answers 503
+    np = None
+
+# Local imports
+from config import api, db, metrics
+from models import FavoriteRecipe, RecipeRating
+
+# Rating r counts as r / 5 of an interaction, a favorite as a whole one;
+# where a user did both, the larger wins.
+RATINGS = "SELECT user_id, recipe_id, rating / 5.0 FROM recipe_ratings"
+FAVORITES = "SELECT user_id, recipe_id, 1.0 FROM favorite_recipes"
+ALL_INTERACTIONS = text(f"{RATINGS} UNION ALL {FAVORITES}")
+INTERACTIONS_FOR = text(
+    f"{RATINGS} WHERE recipe_id IN :ids UNION ALL {FAVORITES} WHERE recipe_id IN :ids"
+).bindparams(bindparam("ids", expanding=True))
+USER_INTERACTIONS = text(
+    f"{RATINGS} WHERE user_id = :user_id UNION ALL {FAVORITES} WHERE user_id = :user_id"
+)
+# (recipe, other recipe) pairs per neighbors() call, each of which costs
+# about 90 bytes of temporaries there
+MAX_PAIRS = 1 << 20
+
+
+class RecommendationsUnavailable(ServiceUnavailable):
+    def __init__(self, reason, retry_after=None):
+        super().__init__(retry_after=retry_after)
+        self.data = {"error": reason}
+
+
+def _ranges(starts, lengths):
+    """Concatenated np.arange(start, start + length) for each pair."""
+    offsets = np.cumsum(lengths) - lengths
+    return np.repeat(starts - offsets, lengths) + np.arange(lengths.sum())
+
+
+def _load(connection, statement, **params):
+    # Flattened first: numpy probes each Row for array attributes otherwise
+    rows = chain.from_iterable(connection.execute(statement, params))
+    data = np.fromiter(rows, dtype=np.float64).reshape(-1, 3)
+    return data[:, 0].astype(np.int64), data[:, 1].astype(np.int64), data[:, 2]
+
+
+class Interactions:
+    """Sparse user x recipe weights, indexed both ways.
+
+    Entries are sorted by (recipe, user) with one weight per pair, and
+    item_ptr[r]:item_ptr[r + 1] spans recipe r's entries; user_order and
+    user_ptr give the same view by user. Ids are used directly as
+    indexes, so the arrays are sized by the largest id.
+    """
+
+    def __init__(self, users, items, weights, n_users=0, n_items=0):
+        self.n_users = max(n_users, int(users.max()) + 1 if len(users) else 0)
+        self.n_items = max(n_items, int(items.max()) + 1 if len(items) else 0)
+
+        # Keep the largest weight for each (recipe, user) pair
+        key = items * self.n_users + users
+        order = np.lexsort((-weights, key))
+        key = key[order]
+        first = np.ones(len(key), dtype=bool)
+        first[1:] = key[1:] != key[:-1]
+        order = order[first]
+        self.users, self.items, self.weights = (
+            users[order],
+            items[order],
+            weights[order],
+        )
+
+        self.item_ptr = np.zeros(self.n_items + 1, dtype=np.int64)
+        np.cumsum(
+            np.bincount(self.items, minlength=self.n_items), out=self.item_ptr[1:]
+        )
+        self.user_order = np.argsort(self.users, kind="stable")
+        self.user_ptr = np.zeros(self.n_users + 1, dtype=np.int64)
+        np.cumsum(
+            np.bincount(self.users, minlength=self.n_users), out=self.user_ptr[1:]
+        )
+        self.norms = np.sqrt(
+            np.bincount(self.items, weights=self.weights**2, minlength=self.n_items)
+        )
+        # Pairs neighbors() expands each recipe into: one per entry of
+        # each of its users
+        self.pairs = np.bincount(
+            self.items,
+            weights=np.diff(self.user_ptr)[self.users],
+            minlength=self.n_items,
+        )
+
+    def blocks(self, recipe_ids, max_pairs=MAX_PAIRS):
+        """Split (sorted) `recipe_ids` into runs of at most `max_pairs`
+        pairs for neighbors(); a recipe with more gets a run to itself."""
+        ends = np.cumsum(self.pairs[recipe_ids])
+        blocks = []
+        start = 0
+        while start < len(recipe_ids):
+            done = ends[start - 1] if start else 0
+            stop = max(
+                int(np.searchsorted(ends, done + max_pairs, side="right")), start + 1
+            )
+            blocks.append(recipe_ids[start:stop])
+            start = stop
+        return blocks
+
+    def without(self, recipe_ids):
+        """(users, items, weights) for every recipe except `recipe_ids`."""
+        keep = ~np.isin(self.items, recipe_ids)
+        return self.users[keep], self.items[keep], self.weights[keep]
+
+    def co_items(self, recipe_ids):
+        """Recipes sharing at least one user with any of `recipe_ids`."""
+        recipe_ids = recipe_ids[recipe_ids < self.n_items]
+        starts = self.item_ptr[recipe_ids]
+        entries = _ranges(starts, self.item_ptr[recipe_ids + 1] - starts)
+        users = np.unique(self.users[entries])
+        starts = self.user_ptr[users]
+        positions = self.user_order[_ranges(starts, self.user_ptr[users + 1] - starts)]
+        return np.unique(self.items[positions])
+
+    def neighbors(self, recipe_ids, k):
+        """Top-k cosine neighbors of each recipe in (sorted, unique)
+        `recipe_ids`, as (ids, scores) arrays of shape (n, k), padded with
+        -1 and 0."""
+        out_ids = np.full((len(recipe_ids), k), -1, dtype=np.int32)
+        out_scores = np.zeros((len(recipe_ids), k), dtype=np.float32)
+
+        # Every (recipe, user) entry, then every other recipe that user has
+        starts = self.item_ptr[recipe_ids]
+        lengths = self.item_ptr[recipe_ids + 1] - starts
+        entries = _ranges(starts, lengths)
+        items = np.repeat(recipe_ids, lengths)
+        users = self.users[entries]
+        starts = self.user_ptr[users]
+        lengths = self.user_ptr[users + 1] - starts
+        positions = self.user_order[_ranges(starts, lengths)]
+        items = np.repeat(items, lengths)
+        others = self.items[positions]
+        products = np.repeat(self.weights[entries], lengths) * self.weights[positions]
+        mask = items != others
+        if not mask.any():
+            return out_ids, out_scores
+
+        pairs, inverse = np.unique(
+            items[mask] * self.n_items + others[mask], return_inverse=True
+        )
+        items, others = np.divmod(pairs, self.n_items)
+        scores = np.bincount(inverse.ravel(), weights=products[mask]) / (
+            self.norms[items] * self.norms[others]
+        )
+
+        # Best first within each recipe, then keep the first k
+        order = np.lexsort((-scores, items))
+        items, others, scores = items[order], others[order], scores[order]
+        rank = np.arange(len(items)) - np.searchsorted(items, items)
+        keep = rank < k
+        rows = np.searchsorted(recipe_ids, items[keep])
+        out_ids[rows, rank[keep]] = others[keep]
+        out_scores[rows, rank[keep]] = scores[keep]
+        return out_ids, out_scores
+
+
+class Recommender:
+    """Item-item collaborative filtering over ratings and favorites.
+
+    Each recipe's `k` most similar recipes (cosine similarity of their
+    user interaction vectors) are precomputed into two (recipes x k)
+    arrays, so a user's recommendations only read the neighbor rows of
+    the recipes they've rated or favorited. A background thread builds
+    them, then every `interval` seconds recomputes just the rows that
+    ratings and favorites committed in this process could have changed;
+    a full rebuild every `max_age` seconds picks up other processes'
+    writes. With RECOMMENDATIONS_BACKGROUND off (tests, scripts) the same
+    work happens inline on the next request instead.
+    """
+
+    def __init__(self, k=20, interval=30, max_age=900):
+        self.k = k
+        self.interval = interval
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        # Held while building or refreshing, which only one thread may do
+        self._work_lock = threading.Lock()
+        self._thread = None
+        self._pending = set()
+        self._interactions = None
+        self._neighbors = None
+        self._scores = None
+        self._built_at = None
+        self.builds = 0
+        self.refreshes = 0
+        self.build_seconds = 0.0
+        self.refresh_seconds = 0.0
+
+    def touched(self, recipe_ids):
+        with self._lock:
+            self._pending.update(recipe_ids)
+
+    def _build(self):
+        started = time.perf_counter()
+        with self._lock:
+            self._pending.clear()
+        interactions = Interactions(*_load(db.session, ALL_INTERACTIONS))
+        recipe_ids = np.flatnonzero(interactions.norms)
+        neighbors = np.full((interactions.n_items, self.k), -1, dtype=np.int32)
+        scores = np.zeros((interactions.n_items, self.k), dtype=np.float32)
+        for block in interactions.blocks(recipe_ids):
+            neighbors[block], scores[block] = interactions.neighbors(block, self.k)
+
+        with self._lock:
+            self._interactions = interactions
+            self._neighbors, self._scores = neighbors, scores
+            self._built_at = time.monotonic()
+            self.builds += 1
+            self.build_seconds = time.perf_counter() - started
+
+    def _refresh(self):
+        with self._lock:
+            touched = np.array(sorted(self._pending), dtype=np.int64)
+            self._pending.clear()
+        if not len(touched):
+            return
+        started = time.perf_counter()
+
+        old = self._interactions
+        users, items, weights = _load(
+            db.session, INTERACTIONS_FOR, ids=touched.tolist()
+        )
+        kept = old.without(touched)
+        interactions = Interactions(
+            np.concatenate([kept[0], users]),
+            np.concatenate([kept[1], items]),
+            np.concatenate([kept[2], weights]),
+            old.n_users,
+            old.n_items,
+        )
+
+        # Rows that could change: the touched recipes, everything they
+        # share a user with before or after, and anything listing them
+        with self._lock:
+            listing = np.flatnonzero(np.isin(self._neighbors, touched).any(axis=1))
+        recipe_ids = np.unique(
+            np.concatenate(
+                [
+                    touched,
+                    old.co_items(touched),
+                    interactions.co_items(touched),
+                    listing,
+                ]
+            )
+        )
+        recipe_ids = recipe_ids[recipe_ids < interactions.n_items]
+        updates = [
+            (block, *interactions.neighbors(block, self.k))
+            for block in interactions.blocks(recipe_ids)
+        ]
+
+        with self._lock:
+            grow = interactions.n_items - len(self._neighbors)
+            if grow > 0:
+                self._neighbors = np.vstack(
+                    [self._neighbors, np.full((grow, self.k), -1, dtype=np.int32)]
+                )
+                self._scores = np.vstack(
+                    [self._scores, np.zeros((grow, self.k), dtype=np.float32)]
+                )
+            for block, neighbors, scores in updates:
+                self._neighbors[block], self._scores[block] = neighbors, scores
+            self._interactions = interactions
+            self.refreshes += 1
+            self.refresh_seconds = time.perf_counter() - started
+
+    def _update(self):
+        with self._work_lock:
+            if self._stale():
+                self._build()
+            else:
+                self._refresh()
+
+    def _stale(self):
+        return self._built_at is None or (
+            time.monotonic() - self._built_at > self.max_age
+        )
+
+    def _run(self, app):
+        while True:
+            try:
+                with app.app_context():
+                    self._update()
+                    db.session.remove()
+            except Exception:
+                app.logger.exception("Recommendations refresh failed")
+            time.sleep(self.interval)
+
+    def _ready(self):
+        if np is None:
+            raise RecommendationsUnavailable("Recommendations need numpy installed")
+        if not current_app.config["RECOMMENDATIONS_BACKGROUND"]:
+            self._update()
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run,
+                    args=(current_app._get_current_object(),),
+                    name="recommendations",
+                    daemon=True,
+                )
+                self._thread.start()
+        if self._built_at is None:
+            raise RecommendationsUnavailable(
+                "Recommendations are being computed, please try again",
+                retry_after=5,
+            )
+
+    def recommend(self, user_id, limit):
+        """Recipes the user hasn't rated or favorited, scored by the sum of
+        their similarity to the ones they have (weighted by interaction),
+        highest first, as dicts with recipe_id and score."""
+        self._ready()
+        _, items, weights = _load(db.session, USER_INTERACTIONS, user_id=user_id)
+        if not len(items):
+            return []
+        seen = np.unique(items)
+
+        with self._lock:
+            known = items < len(self._neighbors)
+            items, weights = items[known], weights[known]
+            neighbors = self._neighbors[items]
+            scores = self._scores[items] * weights[:, None].astype(np.float32)
+
+        candidates = neighbors.ravel()
+        scores = scores.ravel()
+        keep = (candidates >= 0) & ~np.isin(candidates, seen)
+        candidates, inverse = np.unique(candidates[keep], return_inverse=True)
+        totals = np.bincount(inverse.ravel(), weights=scores[keep])
+        best = np.argsort(-totals, kind="stable")[:limit]
+        return [
+            {"recipe_id": int(candidates[i]), "score": float(totals[i])} for i in best
+        ]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "recipes": (
+                    int(np.count_nonzero(self._interactions.norms))
+                    if self._interactions is not None
+                    else None
+                ),
+                "interactions": (
+                    len(self._interactions.items)
+                    if self._interactions is not None
+                    else None
+                ),
+                "pending": len(self._pending),
+                "builds": self.builds,
+                "refreshes": self.refreshes,
+                "build_seconds": self.build_seconds,
+                "refresh_seconds": self.refresh_seconds,
+                "age_seconds": (
+                    time.monotonic() - self._built_at if self._built_at else None
+                ),
+            }
+
+
+recommender = Recommender()
+metrics.register("recommendations", recommender.stats)
+api.handled(RecommendationsUnavailable)
+
+
+@event.listens_for(db.session, "after_flush")
+def _collect_interactions(session, flush_context):
+    recipe_ids = set()
+    for obj in session.new | session.dirty | session.deleted:
+        if isinstance(obj, (RecipeRating, FavoriteRecipe)):
+            recipe_ids.add(obj.recipe_id)
+            recipe_ids.update(inspect(obj).attrs.recipe_id.history.deleted)
+    recipe_ids.discard(None)
+    if recipe_ids:
+        session.info.setdefault("interaction_changes", set()).update(recipe_ids)
+
+
+@event.listens_for(db.session, "after_commit")
+def _apply_interactions(session):
+    recipe_ids = session.info.pop("interaction_changes", None)
+    if recipe_ids:
+        recommender.touched(recipe_ids)
+
+
+@event.listens_for(db.session, "after_rollback")
+def _discard_interactions(session):
+    session.info.pop("interaction_changes", None)
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""Bring the journal_images catalog in line with the files on disk.
+
+Adds a row for every original image in the upload folder that has none
+(owned by the user whose journal entry uses it, if any) and drops rows
+whose file is gone. Safe to re-run; run it once after deploying the
+catalog and from cron if files are ever copied in by hand:
+
+    python reconcile_images.py [--dry-run]
+"""
+
+# Standard library imports
+import argparse
+import os
+from datetime import datetime
+
+# Local imports
+from app import app
+from config import db, image_store
+from models import JournalEntry, JournalImage
+from storage import is_upload
+
+BATCH_SIZE = 500
+
+
+def scan(directory):
+    """(filename, mtime) for every original image in `directory`."""
+    if not os.path.isdir(directory):
+        return {}
+    with os.scandir(directory) as entries:
+        return {
+            entry.name: entry.stat().st_mtime
+            for entry in entries
+            if entry.is_file() and is_upload(entry.name)
+        }
+
+
+def reconcile(dry_run=False):
+    directory = os.path.join(app.config["UPLOAD_FOLDER"], JournalImage.FOLDER)
+    on_disk = scan(directory)
+    cataloged = db.session.query(JournalImage.id, JournalImage.filename).all()
+
+    missing = sorted(set(on_disk) - {filename for _, filename in cataloged})
+    vanished = [image_id for image_id, filename in cataloged if filename not in on_disk]
+    owners = dict(
+        db.session.query(JournalEntry.image_filename, JournalEntry.user_id).filter(
+            JournalEntry.image_filename.isnot(None)
+        )
+    )
+
+    print(
+        f"{len(on_disk)} files, {len(cataloged)} cataloged: "
+        f"{len(missing)} to add, {len(vanished)} to remove"
+    )
+    if dry_run:
+        return
+
+    for start in range(0, len(missing), BATCH_SIZE):
+        rows = []
+        for filename in missing[start : start + BATCH_SIZE]:
+            rows.append(
+                dict(
+                    filename=filename,
+                    user_id=owners.get(filename),
+                    created_at=datetime.utcfromtimestamp(on_disk[filename]),
+                    **image_store.describe(JournalImage.FOLDER, filename),
+                )
+            )
+        db.session.execute(db.insert(JournalImage), rows)
+        db.session.commit()
+
+    for start in range(0, len(vanished), BATCH_SIZE):
+        batch = vanished[start : start + BATCH_SIZE]
+        db.session.execute(db.delete(JournalImage).where(JournalImage.id.in_(batch)))
+        db.session.commit()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+    with app.app_context():
+        reconcile(args.dry_run)
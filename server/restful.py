@@ -0,0 +1,30 @@
+# Remote library imports
+import flask_restful
+
+
+class Api(flask_restful.Api):
+    """flask_restful.Api that answers expected HTTP errors without logging.
+
+    Flask-RESTful logs a traceback for every 5xx it handles, which is
+    right for bugs but turns a burst of deliberate 503s (a saturated
+    hashing pool, say) into a flood of ERROR entries. Exception classes
+    passed to handled() get their usual response, built from the
+    exception's code, headers and `data`, with nothing logged; callers
+    keep count of them themselves.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.handled_errors = ()
+        super().__init__(*args, **kwargs)
+
+    def handled(self, *exception_classes):
+        self.handled_errors += exception_classes
+
+    def handle_error(self, e):
+        if not isinstance(e, self.handled_errors):
+            return super().handle_error(e)
+        headers = e.get_response().headers
+        # The response is rebuilt below, with a length of its own
+        headers.pop("Content-Length", None)
+        data = getattr(e, "data", {"message": e.description})
+        return self.make_response(data, e.code, headers)
@@ -0,0 +1,146 @@
+# Standard library imports
+import html
+import re
+
+# Remote library imports
+from sqlalchemy import DDL, bindparam, event, text
+
+# Local imports
+from config import db
+from changes import attrs_changed, touched_recipe_ids
+from models import Ingredient
+
+# Full-text index over recipes, one row per recipe with rowid = recipes.id.
+# Only SQLite has FTS5, so on other databases the table is never created
+# and search falls back to an empty result.
+CREATE_RECIPE_SEARCH = DDL(
+    "CREATE VIRTUAL TABLE IF NOT EXISTS recipe_search USING fts5("
+    "title, description, instructions, ingredients, "
+    "tokenize = 'porter unicode61')"
+)
+DROP_RECIPE_SEARCH = DDL("DROP TABLE IF EXISTS recipe_search")
+
+event.listen(
+    db.metadata, "after_create", CREATE_RECIPE_SEARCH.execute_if(dialect="sqlite")
+)
+event.listen(
+    db.metadata, "before_drop", DROP_RECIPE_SEARCH.execute_if(dialect="sqlite")
+)
+
+SELECT_ROWS = """
+    INSERT INTO recipe_search (rowid, title, description, instructions, ingredients)
+    SELECT r.id, r.title, r.description, r.instructions,
+           (SELECT group_concat(i.name, ' ')
+              FROM recipe_associations ra
+              JOIN ingredients i ON i.id = ra.ingredient_id
+             WHERE ra.recipe_id = r.id)
+      FROM recipes r
+"""
+INSERT_ALL = text(SELECT_ROWS)
+INSERT_ROWS = text(SELECT_ROWS + " WHERE r.id IN :ids").bindparams(
+    bindparam("ids", expanding=True)
+)
+DELETE_ROWS = text("DELETE FROM recipe_search WHERE rowid IN :ids").bindparams(
+    bindparam("ids", expanding=True)
+)
+RECIPES_USING = text(
+    "SELECT recipe_id FROM recipe_associations WHERE ingredient_id IN :ids"
+).bindparams(bindparam("ids", expanding=True))
+
+# Snippets come back with matches between these two characters, so the
+# recipe text can be escaped before they're turned into <mark> tags.
+MATCH_START = "\x02"
+MATCH_END = "\x03"
+
+# Column weights for bm25(): a hit in the title counts most, then
+# ingredients, then the description, then the instructions.
+SEARCH = text("""
+    SELECT r.id, r.title, r.description, r.meal_type, r.image_url,
+           bm25(recipe_search, 10.0, 2.0, 1.0, 5.0) AS rank,
+           snippet(recipe_search, -1, char(2), char(3), '...', 12) AS snippet
+      FROM recipe_search
+      JOIN recipes r ON r.id = recipe_search.rowid
+     WHERE recipe_search MATCH :match
+     ORDER BY rank
+     LIMIT :limit
+    """)
+
+
+def reindex(connection, recipe_ids):
+    """Rewrite the search rows for `recipe_ids` from the recipes table."""
+    if not recipe_ids or connection.dialect.name != "sqlite":
+        return
+    recipe_ids = list(recipe_ids)
+    connection.execute(DELETE_ROWS, {"ids": recipe_ids})
+    connection.execute(INSERT_ROWS, {"ids": recipe_ids})
+
+
+def rebuild(connection):
+    """Reindex every recipe, e.g. after a bulk load."""
+    if connection.dialect.name != "sqlite":
+        return
+    connection.execute(text("DELETE FROM recipe_search"))
+    connection.execute(INSERT_ALL)
+
+
+@event.listens_for(db.session, "after_flush")
+def _sync_recipe_search(session, flush_context):
+    # Runs inside the flush's transaction, so the index commits or rolls
+    # back together with the rows it describes. Deleted recipes are no
+    # longer in `recipes` and simply drop out.
+    connection = session.connection()
+    if connection.dialect.name != "sqlite":
+        return
+
+    recipe_ids = touched_recipe_ids(
+        session, "title", "description", "instructions", "ingredients_associations"
+    )
+    renamed_ingredient_ids = {
+        obj.id
+        for obj in session.dirty
+        if isinstance(obj, Ingredient) and attrs_changed(obj, "name")
+    }
+
+    if renamed_ingredient_ids:
+        rows = connection.execute(RECIPES_USING, {"ids": list(renamed_ingredient_ids)})
+        recipe_ids.update(row.recipe_id for row in rows)
+
+    reindex(connection, recipe_ids)
+
+
+def highlight(snippet):
+    """`snippet` as HTML: the recipe text escaped, matches in <mark>."""
+    if snippet is None:
+        return None
+    # Strip the markers from the text itself first, in case a recipe has them
+    parts = snippet.split(MATCH_START)
+    escaped = html.escape(parts[0].replace(MATCH_END, ""))
+    for part in parts[1:]:
+        match, _, rest = part.partition(MATCH_END)
+        escaped += (
+            f"<mark>{html.escape(match)}</mark>"
+            f"{html.escape(rest.replace(MATCH_END, ''))}"
+        )
+    return escaped
+
+
+def search_recipes(query, limit):
+    """Recipes matching `query`, best first. Each one's snippet is HTML:
+    escaped recipe text with the matched terms in <mark> tags."""
+    terms = re.findall(r"\w+", query)
+    if not terms:
+        return []
+    # Quote every term so user input can't inject FTS5 query syntax, and
+    # prefix-match the last one for search-as-you-type.
+    match = " ".join(f'"{term}"' for term in terms[:-1])
+    match = f'{match} "{terms[-1]}"*'.strip()
+
+    if db.session.get_bind().dialect.name != "sqlite":
+        return []
+    rows = db.session.execute(SEARCH, {"match": match, "limit": limit})
+    results = []
+    for row in rows:
+        result = dict(row._mapping)
+        result["snippet"] = highlight(result["snippet"])
+        results.append(result)
+    return results
@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""Deterministic bulk dataset for benchmarks and query-plan checks.
+
+Unlike seed.py, rows come from a fixed random seed and are written with
+executemany, so millions of rows load in minutes and every run gets the
+same data. Rows are generated in chunks of CHUNK_SIZE users or recipes,
+each with its own random generator seeded from (seed, stage, chunk), so
+the output doesn't depend on how many worker processes built it. The
+parent process is the only writer. Secondary indexes are dropped for the
+load and rebuilt afterwards; the recipe rating aggregates that models.py
+maintains on insert are computed while generating instead. Every user's
+password is "password".
+
+    python seed_bulk.py --recipes 1000000 [--users N] [--workers 8]
+        [--seed 0] [--reset]
+"""
+
+# Standard library imports
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+# Remote library imports
+import bcrypt
+from sqlalchemy import text
+
+# Local imports
+from config import db
+from models import (
+    Comment,
+    FavoriteRecipe,
+    Ingredient,
+    JournalEntry,
+    JournalImage,
+    Profile,
+    Recipe,
+    RecipeAssociation,
+    RecipeRating,
+    User,
+)
+import search
+
+PASSWORD = "password"
+# Fixed (cheap) bcrypt salt, so the hash is the same on every run too
+SALT = b"$2b$04$seedbulkseedbulkseedbu"
+CHUNK_SIZE = 10_000
+BATCH_SIZE = 5_000
+# Recipes are spread evenly over this period, oldest first
+START = datetime(2024, 1, 1)
+SPAN = timedelta(days=730).total_seconds()
+MEAL_TYPES = ["breakfast", "lunch", "dinner"]
+WORDS = (
+    "quick easy spicy creamy crispy smoky roasted grilled baked fresh "
+    "sweet savory tangy hearty light classic rustic zesty golden garlic"
+).split()
+
+USER_COLUMNS = {
+    User: ("id", "username", "email", "_password_hash"),
+    Profile: ("user_id",),
+}
+RECIPE_COLUMNS = {
+    Recipe: (
+        "id",
+        "title",
+        "description",
+        "instructions",
+        "meal_type",
+        "user_id",
+        "created_at",
+        "updated_at",
+        "rating_count",
+        "rating_sum",
+        "rating_average",
+        "ratings_1",
+        "ratings_2",
+        "ratings_3",
+        "ratings_4",
+        "ratings_5",
+    ),
+    RecipeAssociation: ("recipe_id", "ingredient_id"),
+    RecipeRating: ("recipe_id", "user_id", "rating"),
+    Comment: ("recipe_id", "text"),
+}
+ACTIVITY_COLUMNS = {
+    FavoriteRecipe: ("user_id", "recipe_id", "timestamp"),
+    JournalImage: ("filename", "sha256", "size", "user_id", "created_at"),
+    JournalEntry: ("title", "content", "image_filename", "timestamp", "user_id"),
+}
+
+
+def timestamp(seconds):
+    return START + timedelta(seconds=seconds)
+
+
+def _rng(random_seed, stage, start):
+    return random.Random(f"{random_seed}:{stage}:{start}")
+
+
+def _users(job):
+    start, stop, sizes, random_seed, password_hash = job
+    return {
+        User: [
+            (i, f"user{i}", f"user{i}@example.com", password_hash)
+            for i in range(start, stop)
+        ],
+        Profile: [(i,) for i in range(start, stop)],
+    }
+
+
+def _recipes(job):
+    start, stop, sizes, random_seed = job
+    rng = _rng(random_seed, "recipes", start)
+    users, recipes, ingredients = sizes["users"], sizes["recipes"], sizes["ingredients"]
+    rows = {model: [] for model in RECIPE_COLUMNS}
+    for i in range(start, stop):
+        created = i * SPAN / recipes
+        ratings = [rng.randint(1, 5) for _ in range(rng.randint(0, 6))]
+        buckets = [ratings.count(stars) for stars in range(1, 6)]
+        total = float(sum(ratings))
+        rows[Recipe].append(
+            (
+                i,
+                f"Recipe {i}",
+                " ".join(rng.sample(WORDS, 6)),
+                " ".join(rng.choices(WORDS, k=40)),
+                rng.choice(MEAL_TYPES),
+                rng.randint(1, users),
+                timestamp(created),
+                timestamp(created + rng.uniform(0, 30 * 86400)),
+                len(ratings),
+                total,
+                total / len(ratings) if ratings else None,
+                *buckets,
+            )
+        )
+        for ingredient_id in rng.sample(range(1, ingredients + 1), rng.randint(3, 7)):
+            rows[RecipeAssociation].append((i, ingredient_id))
+        # One rating per user per recipe, as the API allows
+        for user_id, rating in zip(rng.sample(range(1, users + 1), 6), ratings):
+            rows[RecipeRating].append((i, user_id, float(rating)))
+        for _ in range(rng.randint(0, 4)):
+            rows[Comment].append((i, " ".join(rng.sample(WORDS, 5))))
+    return rows
+
+
+def _activity(job):
+    start, stop, sizes, random_seed = job
+    rng = _rng(random_seed, "activity", start)
+    recipes = sizes["recipes"]
+    rows = {model: [] for model in ACTIVITY_COLUMNS}
+    for user_id in range(start, stop):
+        for recipe_id in rng.sample(range(1, recipes + 1), min(5, recipes)):
+            rows[FavoriteRecipe].append(
+                (user_id, recipe_id, timestamp(rng.uniform(0, SPAN)))
+            )
+        for n in range(2):
+            digest = f"{user_id * 2 + n:064x}"
+            created = timestamp(rng.uniform(0, SPAN))
+            rows[JournalImage].append(
+                (
+                    f"{digest}.png",
+                    digest,
+                    rng.randint(20_000, 2_000_000),
+                    user_id,
+                    created,
+                )
+            )
+            rows[JournalEntry].append(
+                (
+                    "Day",
+                    " ".join(rng.sample(WORDS, 8)),
+                    f"{digest}.png",
+                    created,
+                    user_id,
+                )
+            )
+    return rows
+
+
+def _insert(connection, columns, rows):
+    for model, names in columns.items():
+        statement = model.__table__.insert()
+        batch = rows[model]
+        for start in range(0, len(batch), BATCH_SIZE):
+            connection.execute(
+                statement,
+                [dict(zip(names, row)) for row in batch[start : start + BATCH_SIZE]],
+            )
+
+
+def _advance_sequences(connection, tables):
+    # Rows were written with explicit ids, which don't move Postgres
+    # sequences; the app's next insert would reuse a seeded id
+    if connection.dialect.name != "postgresql":
+        return
+    for table in tables:
+        connection.execute(
+            text(
+                f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), "
+                f"(SELECT max(id) FROM {table.name}))"
+            )
+        )
+
+
+def seed(recipes, users=None, random_seed=0, workers=None, verbose=False):
+    """Bulk-insert a dataset sized by the number of recipes.
+
+    Call inside an app context, on empty tables. `workers` defaults to
+    one process per CPU, and generation stays in-process for datasets of
+    a single chunk. Returns the number of rows written per table.
+    """
+    sizes = {
+        "recipes": recipes,
+        "users": users or max(10, recipes // 10),
+        "ingredients": max(20, recipes // 20),
+    }
+    password_hash = bcrypt.hashpw(PASSWORD.encode("utf-8"), SALT).decode("utf-8")
+    stages = [
+        (_users, USER_COLUMNS, "users", (password_hash,)),
+        (_recipes, RECIPE_COLUMNS, "recipes", ()),
+        (_activity, ACTIVITY_COLUMNS, "users", ()),
+    ]
+    chunks = max(-(-sizes[size] // CHUNK_SIZE) for _, _, size, _ in stages)
+    workers = min(workers or os.cpu_count() or 1, chunks)
+    pool = multiprocessing.Pool(workers) if workers > 1 else None
+    mapper = pool.imap if pool else map
+
+    connection = db.session.connection()
+    tables = [Ingredient.__table__] + [
+        model.__table__ for _, columns, _, _ in stages for model in columns
+    ]
+    indexes = [index for table in tables for index in table.indexes]
+    for index in indexes:
+        index.drop(connection)
+
+    counts = {}
+    try:
+        connection.execute(
+            Ingredient.__table__.insert(),
+            [
+                {
+                    "id": i,
+                    "name": f"ingredient {i}",
+                    "normalized_name": f"ingredient {i}",
+                }
+                for i in range(1, sizes["ingredients"] + 1)
+            ],
+        )
+        counts["ingredients"] = sizes["ingredients"]
+        for generate, columns, size, extra in stages:
+            jobs = (
+                (start, min(start + CHUNK_SIZE, sizes[size] + 1), sizes, random_seed)
+                + extra
+                for start in range(1, sizes[size] + 1, CHUNK_SIZE)
+            )
+            for rows in mapper(generate, jobs):
+                _insert(connection, columns, rows)
+                for model, batch in rows.items():
+                    name = model.__tablename__
+                    counts[name] = counts.get(name, 0) + len(batch)
+                if verbose:
+                    print(
+                        f"  {generate.__name__[1:]}: {sum(counts.values()):,} rows",
+                        flush=True,
+                    )
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+
+    for index in indexes:
+        index.create(connection)
+    _advance_sequences(connection, [table for table in tables if "id" in table.c])
+    search.rebuild(connection)
+    db.session.commit()
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--recipes", type=int, default=100_000)
+    parser.add_argument("--users", type=int, help="default: recipes / 10")
+    parser.add_argument("--workers", type=int, help="default: one per CPU")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--reset", action="store_true", help="drop and recreate every table first"
+    )
+    args = parser.parse_args()
+
+    from app import app
+
+    with app.app_context():
+        if args.reset:
+            db.drop_all()
+        db.create_all()
+        if db.session.query(User.id).first() is not None:
+            sys.exit("The database already has users; pass --reset to replace them")
+        started = time.perf_counter()
+        counts = seed(
+            args.recipes,
+            users=args.users,
+            random_seed=args.seed,
+            workers=args.workers,
+            verbose=True,
+        )
+    print(
+        f"Wrote {sum(counts.values()):,} rows in "
+        f"{time.perf_counter() - started:.1f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+# Standard library imports
+import json
+
+# Remote library imports
+from flask import Response, request
+from sqlalchemy import DateTime, inspect
+
+try:
+    import orjson
+except ImportError:  # optional, falls back to the standard library
+    orjson = None
+
+# Local imports
+from metrics import timed
+from models import (
+    User,
+    Profile,
+    Recipe,
+    Ingredient,
+    Comment,
+    FavoriteRecipe,
+    RecipeRating,
+    JournalEntry,
+    JournalImage,
+)
+
+DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S"  # same as SerializerMixin
+MAX_CACHED_FIELDSETS = 64
+
+
+def _format_datetime(value):
+    return value.strftime(DATETIME_FORMAT)
+
+
+class Serializer:
+    """Precompiled replacement for SerializerMixin.to_dict on one model.
+
+    The column list (honouring the model's serialize_only and simple
+    "-column" serialize_rules) and the nested serializers are resolved
+    once, at import, instead of on every object and recursion level.
+    Pass `fields` to emit only some top-level keys.
+    """
+
+    def __init__(self, model, nested=None, exclude=()):
+        mapper = inspect(model)
+        only = set(getattr(model, "serialize_only", ()))
+        exclude = set(exclude) | {
+            rule[1:]
+            for rule in getattr(model, "serialize_rules", ())
+            if rule.startswith("-") and "." not in rule
+        }
+
+        self.columns = []
+        for attr in mapper.column_attrs:
+            if (only and attr.key not in only) or attr.key in exclude:
+                continue
+            column_type = attr.columns[0].type
+            convert = _format_datetime if isinstance(column_type, DateTime) else None
+            self.columns.append((attr.key, convert))
+
+        self.nested = [
+            (key, serializer, mapper.relationships[key].uselist)
+            for key, serializer in (nested or {}).items()
+        ]
+        self.relationships = frozenset(key for key, _, _ in self.nested)
+        self._plans = {None: (self.columns, self.nested)}
+
+    def _plan(self, fields):
+        plan = self._plans.get(fields)
+        if plan is None:
+            plan = (
+                [c for c in self.columns if c[0] in fields],
+                [n for n in self.nested if n[0] in fields],
+            )
+            if len(self._plans) < MAX_CACHED_FIELDSETS:
+                self._plans[fields] = plan
+        return plan
+
+    def needs_relationships(self, fields=None):
+        """Whether serializing `fields` touches any relationship."""
+        return fields is None or bool(self.relationships & fields)
+
+    def __call__(self, obj, fields=None):
+        columns, nested = self._plan(fields)
+        data = {}
+        for key, convert in columns:
+            value = getattr(obj, key)
+            data[key] = convert(value) if convert and value is not None else value
+        for key, serializer, many in nested:
+            value = getattr(obj, key)
+            if many:
+                data[key] = [serializer(item) for item in value]
+            else:
+                data[key] = serializer(value) if value is not None else None
+        return data
+
+    def many(self, objs, fields=None):
+        with timed("serialize"):
+            return [self(obj, fields) for obj in objs]
+
+
+def requested_fields():
+    """Parse ?fields=id,title into a frozenset, or None for all fields."""
+    fields = request.args.get("fields")
+    if not fields:
+        return None
+    return frozenset(field.strip() for field in fields.split(",") if field.strip())
+
+
+def dumps(data):
+    with timed("serialize"):
+        if orjson is not None:
+            return orjson.dumps(data)
+        return json.dumps(data, separators=(",", ":"))
+
+
+def json_response(data, status=200):
+    return Response(dumps(data), status=status, mimetype="application/json")
+
+
+# Shapes mirror what to_dict() produced for these models, minus
+# User._password_hash (which should never have been exposed) and the
+# RecipeAssociation lists, which SerializerMixin can't serialize and always
+# rendered as [].
+JOURNAL_ENTRY = Serializer(JournalEntry)
+USER = Serializer(
+    User, nested={"journal_entries": JOURNAL_ENTRY}, exclude=("_password_hash",)
+)
+PROFILE = Serializer(Profile)
+COMMENT = Serializer(Comment)
+FAVORITE_RECIPE = Serializer(FavoriteRecipe, nested={"user": USER, "profile": PROFILE})
+RECIPE_RATING = Serializer(RecipeRating, nested={"user": USER})
+RECIPE = Serializer(
+    Recipe,
+    nested={
+        "comments": COMMENT,
+        "favorite_recipes": FAVORITE_RECIPE,
+        "recipe_ratings": RECIPE_RATING,
+    },
+)
+INGREDIENT = Serializer(Ingredient)
+JOURNAL_IMAGE = Serializer(JournalImage)
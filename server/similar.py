@@ -0,0 +1,147 @@
+# Standard library imports
+import heapq
+import random
+from array import array
+from bisect import bisect_left, insort
+
+# Local imports
+from pantry import IngredientSetIndex
+
+NUM_PERM = 32
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+MAX_CANDIDATES = 2000
+MASK = 0xFFFFFFFF
+PRIME = (1 << 61) - 1
+# Fixed so every process computes the same signatures
+_rng = random.Random(0)
+PERMUTATIONS = [
+    (_rng.randrange(1, PRIME), _rng.randrange(0, PRIME)) for _ in range(NUM_PERM)
+]
+
+
+class SimilarityIndex(IngredientSetIndex):
+    """MinHash/LSH index over each recipe's set of ingredient ids.
+
+    A recipe's signature is the minimum of NUM_PERM hashes over its
+    ingredients; the fraction of positions two signatures agree on
+    estimates the Jaccard similarity of their ingredient sets. Signatures
+    are stored back to back in one array of 32-bit ints, indexed by
+    recipe id. For candidate lookup each signature is cut into BANDS bands
+    of ROWS values, and each band keeps a sorted array of (band hash << 32
+    | recipe id), so recipes sharing a band are one bisect away; with 16
+    bands of 2, pairs above roughly 0.25 similarity are likely to collide
+    somewhere.
+    """
+
+    name = "similarity-index"
+
+    def __init__(self, max_age=300):
+        super().__init__(max_age)
+        self._hashes = {}
+        self._signatures = array("I")
+        self._present = bytearray()
+        self._bands = [array("Q") for _ in range(BANDS)]
+
+    def _ingredient_hashes(self, ingredient_id):
+        hashes = self._hashes.get(ingredient_id)
+        if hashes is None:
+            hashes = self._hashes[ingredient_id] = [
+                ((a * ingredient_id + b) % PRIME) & MASK for a, b in PERMUTATIONS
+            ]
+        return hashes
+
+    def _signature_for(self, ingredient_ids):
+        hashes = [self._ingredient_hashes(i) for i in ingredient_ids]
+        return [min(values) for values in zip(*hashes)]
+
+    def _signature(self, recipe_id):
+        start = recipe_id * NUM_PERM
+        return self._signatures[start : start + NUM_PERM]
+
+    @staticmethod
+    def _band_keys(signature, recipe_id):
+        for band in range(BANDS):
+            values = tuple(signature[band * ROWS : (band + 1) * ROWS])
+            yield band, (hash(values) & MASK) << 32 | recipe_id
+
+    def _store(self, recipe_id, signature):
+        end = (recipe_id + 1) * NUM_PERM
+        if len(self._signatures) < end:
+            self._signatures.extend([0] * (end - len(self._signatures)))
+            self._present.extend(bytes(recipe_id + 1 - len(self._present)))
+        self._signatures[recipe_id * NUM_PERM : end] = array("I", signature)
+        self._present[recipe_id] = 1
+
+    def _is_indexed(self, recipe_id):
+        return 0 <= recipe_id < len(self._present) and self._present[recipe_id]
+
+    def _build(self, by_recipe):
+        size = max(by_recipe, default=-1) + 1
+        signatures = array("I", bytes(4 * NUM_PERM * size))
+        present = bytearray(size)
+        bands = [[] for _ in range(BANDS)]
+        for recipe_id, ingredient_ids in by_recipe.items():
+            signature = self._signature_for(ingredient_ids)
+            signatures[recipe_id * NUM_PERM : (recipe_id + 1) * NUM_PERM] = array(
+                "I", signature
+            )
+            present[recipe_id] = 1
+            for band, key in self._band_keys(signature, recipe_id):
+                bands[band].append(key)
+        return signatures, present, [array("Q", sorted(keys)) for keys in bands]
+
+    def _install(self, state):
+        self._signatures, self._present, self._bands = state
+
+    def _apply(self, changes):
+        for recipe_id, ingredient_ids in changes.items():
+            if self._is_indexed(recipe_id):
+                old = self._signature(recipe_id)
+                for band, key in self._band_keys(old, recipe_id):
+                    keys = self._bands[band]
+                    keys.pop(bisect_left(keys, key))
+                self._present[recipe_id] = 0
+            if ingredient_ids:
+                signature = self._signature_for(ingredient_ids)
+                self._store(recipe_id, signature)
+                for band, key in self._band_keys(signature, recipe_id):
+                    insort(self._bands[band], key)
+
+    def similar(self, recipe_id, limit):
+        """Recipes whose ingredients overlap `recipe_id`'s, most similar
+        first, as dicts with recipe_id and similarity (estimated Jaccard).
+
+        Returns None if the recipe has no ingredients indexed.
+        """
+        self.ensure_loaded()
+        with self._lock:
+            if not self._is_indexed(recipe_id):
+                return None
+            signature = self._signature(recipe_id)
+
+            # How many bands each candidate shares with the recipe
+            shared = {}
+            for band, key in self._band_keys(signature, recipe_id):
+                keys = self._bands[band]
+                bucket = key & ~MASK
+                start = bisect_left(keys, bucket)
+                stop = bisect_left(keys, bucket + (1 << 32), start)
+                for other in keys[start:stop]:
+                    other &= MASK
+                    shared[other] = shared.get(other, 0) + 1
+            shared.pop(recipe_id, None)
+            candidates = shared
+            if len(shared) > MAX_CANDIDATES:
+                candidates = heapq.nlargest(MAX_CANDIDATES, shared, key=shared.get)
+
+            results = []
+            for other in candidates:
+                agree = sum(a == b for a, b in zip(signature, self._signature(other)))
+                results.append({"recipe_id": other, "similarity": agree / NUM_PERM})
+
+        results.sort(key=lambda r: (-r["similarity"], r["recipe_id"]))
+        return results[:limit]
+
+
+similar_recipes = SimilarityIndex()
@@ -0,0 +1,271 @@
+# Standard library imports
+import hashlib
+import mimetypes
+import os
+import re
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Remote library imports
+from flask import request
+from werkzeug.exceptions import BadRequest, NotFound
+from werkzeug.security import safe_join
+from werkzeug.utils import send_file
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # optional, uploads are stored without variants
+    Image = None
+
+CHUNK_SIZE = 64 * 1024
+PIL_FORMATS = {"jpg": "JPEG", "png": "PNG", "gif": "GIF", "webp": "WEBP"}
+# "<sha256>.<ext>" or "<sha256>.<variant>.<ext>", as written by ImageStore.save
+CONTENT_ADDRESSED = re.compile(r"^([0-9a-f]{64}(?:\.[a-z]+)?)\.[a-z0-9]+$")
+VARIANT = re.compile(r"^[0-9a-f]{64}\.[a-z]+\.[a-z0-9]+$")
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+
+def sniff_extension(head):
+    """Extension for the image type in the file's first bytes, or None."""
+    if head.startswith(b"\xff\xd8\xff"):
+        return "jpg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png"
+    if head[:6] in (b"GIF87a", b"GIF89a"):
+        return "gif"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "webp"
+    return None
+
+
+class UnsupportedImage(BadRequest):
+    def __init__(self, filename):
+        super().__init__()
+        self.data = {"error": f"Unsupported image type: {filename!r}"}
+
+
+def is_upload(filename):
+    """Whether a name in an upload folder is an original image, as opposed
+    to a resized variant or a temp file from an upload in progress."""
+    return (
+        not filename.startswith(".")
+        and not filename.endswith((".upload", ".tmp"))
+        and not VARIANT.match(filename)
+    )
+
+
+def variant_name(filename, variant, ext=None):
+    """'<hash>.jpg' -> '<hash>.thumb.jpg' (or '<hash>.thumb.webp')."""
+    digest, original_ext = filename.rsplit(".", 1)
+    return f"{digest}.{variant}.{ext or original_ext}"
+
+
+class ImageStore:
+    """Content-addressed image uploads with background resizing.
+
+    Uploads are streamed to a temp file in CHUNK_SIZE pieces while being
+    hashed, then renamed to '<sha256>.<ext>' in the folder, so the same
+    image uploaded twice is stored once. The IMAGE_VARIANTS sizes (plus
+    WebP copies when IMAGE_WEBP is set) are written next to the original by
+    an IMAGE_WORKERS thread pool after the upload request has returned;
+    until a variant exists, clients should fall back to the original.
+    """
+
+    def __init__(self, app=None):
+        self._executor = None
+        self._lock = threading.Lock()
+        self._pending = set()
+        self.stored = 0
+        self.deduplicated = 0
+        self.variants_written = 0
+        self.variant_errors = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault("IMAGE_VARIANTS", {"thumb": 200, "medium": 800})
+        app.config.setdefault("IMAGE_WEBP", True)
+        app.config.setdefault("IMAGE_WORKERS", 2)
+        app.config.setdefault("IMAGE_QUALITY", 85)
+        # None serves bytes from Python; "x-sendfile" (Apache, lighttpd) or
+        # "x-accel-redirect" (nginx) hands the file to the front proxy, which
+        # must map UPLOADS_ACCEL_PREFIX to UPLOAD_FOLDER as an internal location.
+        app.config.setdefault("UPLOADS_OFFLOAD", None)
+        app.config.setdefault("UPLOADS_ACCEL_PREFIX", "/_uploads/")
+        self.config = app.config
+
+    def folder(self, name):
+        path = os.path.join(self.config["UPLOAD_FOLDER"], name)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def save(self, file_storage, folder):
+        """Store an uploaded FileStorage and return its content-addressed name.
+
+        The extension comes from the file's contents, not the client's
+        filename, so the same bytes always get the same name.
+        """
+        chunk = file_storage.stream.read(CHUNK_SIZE)
+        ext = sniff_extension(chunk)
+        if ext is None:
+            raise UnsupportedImage(file_storage.filename)
+
+        directory = self.folder(folder)
+        digest = hashlib.sha256()
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".upload")
+        try:
+            with os.fdopen(fd, "wb") as out:
+                while chunk:
+                    digest.update(chunk)
+                    out.write(chunk)
+                    chunk = file_storage.stream.read(CHUNK_SIZE)
+
+            filename = f"{digest.hexdigest()}.{ext}"
+            path = os.path.join(directory, filename)
+            if os.path.exists(path):
+                os.remove(tmp_path)
+                with self._lock:
+                    self.deduplicated += 1
+            else:
+                os.replace(tmp_path, path)
+                with self._lock:
+                    self.stored += 1
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        self._schedule_variants(directory, filename)
+        return filename
+
+    def _schedule_variants(self, directory, filename):
+        if Image is None or not self.config["IMAGE_VARIANTS"]:
+            return
+        key = os.path.join(directory, filename)
+        with self._lock:
+            if key in self._pending or not self._missing(directory, filename):
+                return
+            self._pending.add(key)
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.config["IMAGE_WORKERS"],
+                    thread_name_prefix="image-variants",
+                )
+            self._executor.submit(self._write_variants, directory, filename, key)
+
+    def _targets(self, filename):
+        ext = filename.rsplit(".", 1)[1]
+        for variant, size in self.config["IMAGE_VARIANTS"].items():
+            yield variant_name(filename, variant), ext, size
+            if self.config["IMAGE_WEBP"] and ext != "webp":
+                yield variant_name(filename, variant, "webp"), "webp", size
+
+    def _missing(self, directory, filename):
+        return [
+            target
+            for target in self._targets(filename)
+            if not os.path.exists(os.path.join(directory, target[0]))
+        ]
+
+    def _write_variants(self, directory, filename, key):
+        try:
+            with Image.open(os.path.join(directory, filename)) as source:
+                # Honour camera rotation before the EXIF data is dropped
+                image = ImageOps.exif_transpose(source)
+                for name, ext, size in self._missing(directory, filename):
+                    resized = image.copy()
+                    resized.thumbnail((size, size))
+                    if PIL_FORMATS[ext] == "JPEG" and resized.mode not in ("RGB", "L"):
+                        resized = resized.convert("RGB")
+                    # Write under a temp name so readers never see a partial file
+                    tmp_path = os.path.join(directory, f".{name}.tmp")
+                    resized.save(
+                        tmp_path,
+                        PIL_FORMATS[ext],
+                        quality=self.config["IMAGE_QUALITY"],
+                    )
+                    os.replace(tmp_path, os.path.join(directory, name))
+                    with self._lock:
+                        self.variants_written += 1
+        except Exception:
+            with self._lock:
+                self.variant_errors += 1
+        finally:
+            with self._lock:
+                self._pending.discard(key)
+
+    def describe(self, folder, filename):
+        """Catalog metadata for a stored original: hash, size, dimensions."""
+        path = os.path.join(self.config["UPLOAD_FOLDER"], folder, filename)
+        match = CONTENT_ADDRESSED.match(filename)
+        if match:
+            sha256 = match.group(1)
+        else:
+            # Uploaded before content addressing; hash it the slow way
+            digest = hashlib.sha256()
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                    digest.update(chunk)
+            sha256 = digest.hexdigest()
+
+        width = height = None
+        if Image is not None:
+            try:
+                # Only reads the header, not the pixels
+                with Image.open(path) as image:
+                    width, height = image.size
+            except Exception:
+                pass
+
+        return {
+            "sha256": sha256,
+            "size": os.path.getsize(path),
+            "width": width,
+            "height": height,
+            "content_type": mimetypes.guess_type(filename)[0],
+        }
+
+    def send(self, folder, filename):
+        """Response for GET /uploads/<folder>/<filename>.
+
+        Handles If-None-Match, If-Modified-Since and Range. Content-addressed
+        names never change, so they're cached for a year as immutable with
+        the hash as a strong ETag; anything else must be revalidated.
+        """
+        root = os.path.abspath(self.config["UPLOAD_FOLDER"])
+        path = safe_join(root, folder, filename)
+        if path is None or not os.path.isfile(path):
+            raise NotFound()
+
+        match = CONTENT_ADDRESSED.match(filename)
+        offload = self.config["UPLOADS_OFFLOAD"]
+        response = send_file(
+            path,
+            request.environ,
+            etag=match.group(1) if match else True,
+            max_age=IMMUTABLE_MAX_AGE if match else 0,
+            use_x_sendfile=bool(offload),
+        )
+        if match:
+            response.cache_control.immutable = True
+        else:
+            response.cache_control.no_cache = True
+
+        if offload == "x-accel-redirect" and "X-Sendfile" in response.headers:
+            del response.headers["X-Sendfile"]
+            response.headers["X-Accel-Redirect"] = (
+                self.config["UPLOADS_ACCEL_PREFIX"] + f"{folder}/{filename}"
+            )
+        return response
+
+    def stats(self):
+        with self._lock:
+            return {
+                "stored": self.stored,
+                "deduplicated": self.deduplicated,
+                "pending": len(self._pending),
+                "variants_written": self.variants_written,
+                "variant_errors": self.variant_errors,
+                "resizing_available": Image is not None,
+            }
@@ -0,0 +1,122 @@
+# Remote library imports
+from sqlalchemy import event, func, inspect
+
+# Local imports
+from config import db
+from models import ChangeLog, Comment, FavoriteRecipe, Recipe, RecipeRating
+import load_plans
+import serializers
+
+SYNC_PAGE_SIZE = 500
+
+# Synced models by the key they're reported under, with the query options
+# and serializer used to send their current state.
+ENTITIES = {
+    "recipes": (Recipe, (), serializers.RECIPE),
+    "recipe_ratings": (
+        RecipeRating,
+        load_plans.RECIPE_RATING_USER,
+        serializers.RECIPE_RATING,
+    ),
+    "comments": (Comment, (), serializers.COMMENT),
+    "favorite_recipes": (
+        FavoriteRecipe,
+        load_plans.FAVORITE_RECIPE,
+        serializers.FAVORITE_RECIPE,
+    ),
+}
+ENTITY_NAMES = {model: name for name, (model, _, _) in ENTITIES.items()}
+
+# Ratings, comments and favorites are synced on their own, so recipes are
+# sent without those nested lists; a rating change re-sends its recipe for
+# the new rating_average and rating_count.
+RECIPE_FIELDS = frozenset(key for key, _ in serializers.RECIPE.columns)
+
+
+@event.listens_for(db.session, "after_flush")
+def _log_changes(session, flush_context):
+    changes = {}
+    for obj in session.new | session.dirty:
+        name = ENTITY_NAMES.get(type(obj))
+        if name is None or not (obj in session.new or session.is_modified(obj)):
+            continue
+        changes[(name, obj.id)] = False
+        if isinstance(obj, RecipeRating):
+            changes.setdefault(("recipes", obj.recipe_id), False)
+            for old_recipe_id in inspect(obj).attrs.recipe_id.history.deleted:
+                changes.setdefault(("recipes", old_recipe_id), False)
+    for obj in session.deleted:
+        name = ENTITY_NAMES.get(type(obj))
+        if name is None:
+            continue
+        changes[(name, obj.id)] = True
+        if isinstance(obj, RecipeRating):
+            changes.setdefault(("recipes", obj.recipe_id), False)
+
+    rows = [
+        {"entity": name, "entity_id": entity_id, "deleted": deleted}
+        for (name, entity_id), deleted in changes.items()
+        if entity_id is not None
+    ]
+    if rows:
+        # Same transaction as the change itself, so the log can't miss one
+        session.connection().execute(ChangeLog.__table__.insert(), rows)
+
+
+def sync_supported():
+    """Whether sync tokens can be trusted on this database.
+
+    A token is the last change_log id a client has seen, which is only
+    safe while ids commit in order. SQLite has one writer at a time, so
+    they do. With concurrent writers (Postgres, MySQL) a transaction
+    holding a lower id can commit after a client has synced past a higher
+    one, and that client would never see the change. Sync is therefore
+    SQLite-only.
+    """
+    return db.engine.dialect.name == "sqlite"
+
+
+def current_token():
+    return db.session.query(func.max(ChangeLog.id)).scalar() or 0
+
+
+def changes_since(token, limit=SYNC_PAGE_SIZE):
+    """What changed after sync token `token`, as a JSON-ready dict.
+
+    Reads at most `limit` log rows; when has_more is set the client should
+    call again with the returned token. Several changes to one row are sent
+    once, with its current state, and rows deleted since are tombstones.
+    """
+    log = (
+        ChangeLog.query.filter(ChangeLog.id > token)
+        .order_by(ChangeLog.id)
+        .limit(limit + 1)
+        .all()
+    )
+    has_more = len(log) > limit
+    log = log[:limit]
+
+    latest = {}
+    for change in log:
+        latest[(change.entity, change.entity_id)] = change.deleted
+
+    changed = {name: [] for name in ENTITIES}
+    deleted = {name: [] for name in ENTITIES}
+    for (name, entity_id), is_deleted in latest.items():
+        (deleted if is_deleted else changed)[name].append(entity_id)
+
+    for name, ids in changed.items():
+        model, plan, serializer = ENTITIES[name]
+        rows = model.query.options(*plan).filter(model.id.in_(ids)).all() if ids else []
+        found = {row.id for row in rows}
+        # Deleted after this page of the log; the tombstone is already true
+        deleted[name].extend(id for id in ids if id not in found)
+        fields = RECIPE_FIELDS if model is Recipe else None
+        changed[name] = serializer.many(rows, fields)
+
+    return {
+        "token": log[-1].id if log else token,
+        "has_more": has_more,
+        "changed": changed,
+        "deleted": deleted,
+    }